@@ -0,0 +1,33 @@
+import time
+import numpy as np
+import pygame
+from cam import SCREEN_WIDTH, SCREEN_HEIGHT, Camera, Prism, Renderer
+
+def random_prisms(count, seed=0):
+    rng = np.random.default_rng(seed)
+    sizes = rng.uniform(0.5, 3, size=(count, 3))
+    positions = np.column_stack((rng.uniform(-40, 40, count), rng.uniform(-20, 20, count), rng.uniform(-90, -5, count)))
+    return [Prism(size, position) for size, position in zip(sizes, positions)]
+
+def measure(render, repeats):
+    render()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        render()
+    return (time.perf_counter() - start) / repeats
+
+def main():
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    camera = Camera()
+
+    for count in (100, 1000, 5000):
+        renderer = Renderer(screen, camera, random_prisms(count))
+        batched = measure(renderer.render, 10)
+        draw_line = measure(renderer.render_draw_line, 3)
+        print(f"{count:6d} prisms: batched {batched * 1000:8.2f} ms, pygame.draw.line {draw_line * 1000:8.2f} ms, x{draw_line / batched:.1f}")
+
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,17 @@
+import argparse
+import os
+import sys
+import time
 import pygame
 import numpy as np
-from scipy.spatial.transform import Rotation as R
+from scipy.spatial.transform import Rotation as R, Slerp
+from collections import namedtuple
 import math
 import json
+# Moduły wspólne dla wszystkich przeglądarek leżą w katalogu common obok katalogu tego skryptu
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
+from scheduler import LoopScheduler
+from input_log import InputRecorder, InputReplay, EVENT_KEYDOWN, EVENT_KEYUP, EVENT_QUIT, report_timings
 
 # --- Ustawienia ---
 SCREEN_WIDTH, SCREEN_HEIGHT = 1000, 900
@@ -10,6 +19,9 @@ SCREEN_WIDTH, SCREEN_HEIGHT = 1000, 900
 HOLD_START_DELAY = 400
 HOLD_REPEAT_INTERVAL = 50
 
+UPDATE_STEP = 1 / 120
+MAX_FPS = 60
+
 FOV_DEFAULT = 90
 MOVE_SPEED = 1
 ROT_SPEED = {
@@ -21,6 +33,19 @@ ZOOM_STEP = 5
 FOV_LIMITS = (20, 120)
 CLIP_RECT = [0, 0, SCREEN_WIDTH, SCREEN_HEIGHT]
 
+HIDDEN_LINE_SCALE = 4
+HIDDEN_LINE_BIAS = 0.02
+
+# Ściany prostopadłościanu podzielone na trójkąty
+FACE_TRIANGLES = np.array([
+    (0, 3, 2), (0, 2, 1),
+    (4, 5, 6), (4, 6, 7),
+    (0, 1, 5), (0, 5, 4),
+    (2, 3, 7), (2, 7, 6),
+    (0, 4, 7), (0, 7, 3),
+    (1, 2, 6), (1, 6, 5)
+])
+
 
 def load_prisms_from_file(path):
     with open(path, 'r') as f:
@@ -54,9 +79,79 @@ def create_rectangular_prism(width=1, depth=1, height=1):
         [-width/2,  height/2,  depth/2, 1]
     ], dtype=np.float32)
 
+def clip_lines(p0, p1, clip_rect):
+    # Liang-Barsky dla wszystkich odcinków naraz
+    d = p1 - p0
+    t0 = np.zeros(len(p0))
+    t1 = np.ones(len(p0))
+    keep = np.ones(len(p0), dtype=bool)
+    for p, q in ((-d[:, 0], p0[:, 0] - clip_rect[0]), (d[:, 0], clip_rect[2] - p0[:, 0]),
+                 (-d[:, 1], p0[:, 1] - clip_rect[1]), (d[:, 1], clip_rect[3] - p0[:, 1])):
+        parallel = p == 0
+        keep &= ~(parallel & (q < 0))
+        r = q / np.where(parallel, 1, p)
+        t0 = np.where(~parallel & (p < 0), np.maximum(t0, r), t0)
+        t1 = np.where(~parallel & (p > 0), np.minimum(t1, r), t1)
+    keep &= t0 <= t1
+    return keep, t0[keep], t1[keep]
+
+def rasterize_depth(depth, triangles):
+    # depth przechowuje 1/w (0 = pusto), większa wartość oznacza bliżej kamery
+    width, height = depth.shape
+    xy = triangles[:, :, :2]
+    lo = np.floor(xy.min(axis=1)).astype(np.intp)
+    hi = np.floor(xy.max(axis=1)).astype(np.intp)
+    on_screen = (hi[:, 0] >= 0) & (lo[:, 0] < width) & (hi[:, 1] >= 0) & (lo[:, 1] < height)
+    triangles, lo, hi = triangles[on_screen], lo[on_screen], hi[on_screen]
+    lo = np.maximum(lo, 0)
+    hi = np.minimum(hi, (width - 1, height - 1))
+
+    span = hi - lo + 1
+    counts = span[:, 0] * span[:, 1]
+    tri_idx = np.repeat(np.arange(len(triangles)), counts)
+    local = np.arange(len(tri_idx)) - np.repeat(np.cumsum(counts) - counts, counts)
+    px = lo[tri_idx, 0] + local % span[tri_idx, 0]
+    py = lo[tri_idx, 1] + local // span[tri_idx, 0]
+
+    a, b, c = (triangles[tri_idx, k] for k in range(3))
+    cx, cy = px + 0.5, py + 0.5
+    area = (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+    area = np.where(area == 0, np.inf, area)
+    wa = ((c[:, 0] - b[:, 0]) * (cy - b[:, 1]) - (c[:, 1] - b[:, 1]) * (cx - b[:, 0])) / area
+    wb = ((a[:, 0] - c[:, 0]) * (cy - c[:, 1]) - (a[:, 1] - c[:, 1]) * (cx - c[:, 0])) / area
+    wc = 1 - wa - wb
+    inside = (wa >= 0) & (wb >= 0) & (wc >= 0) & np.isfinite(area)
+    z = wa * a[:, 2] + wb * b[:, 2] + wc * c[:, 2]
+    np.maximum.at(depth, (px[inside], py[inside]), z[inside])
+
+def rasterize_lines(framebuffer, p0, p1, color, thickness=1, sample_filter=None):
+    # framebuffer w układzie surfarray: (szerokość, wysokość, 3)
+    width, height = framebuffer.shape[:2]
+    d = p1 - p0
+    steps = np.floor(np.abs(d).max(axis=1)).astype(np.intp) + 1
+    line_idx = np.repeat(np.arange(len(p0)), steps)
+    offsets = np.arange(len(line_idx)) - np.repeat(np.cumsum(steps) - steps, steps)
+    t = offsets / np.maximum(steps - 1, 1)[line_idx]
+    xs = np.rint(p0[line_idx, 0] + d[line_idx, 0] * t).astype(np.intp)
+    ys = np.rint(p0[line_idx, 1] + d[line_idx, 1] * t).astype(np.intp)
+
+    if sample_filter is not None:
+        keep = sample_filter(line_idx, t, xs, ys)
+        line_idx, xs, ys = line_idx[keep], xs[keep], ys[keep]
+
+    # Grubsze linie poszerzamy wzdłuż osi podrzędnej, tak jak pygame.draw.line
+    x_major = (np.abs(d[:, 0]) >= np.abs(d[:, 1]))[line_idx]
+    for k in range(thickness):
+        offset = k - (thickness - 1) // 2
+        px = np.where(x_major, xs, xs + offset)
+        py = np.where(x_major, ys + offset, ys)
+        inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+        framebuffer[px[inside], py[inside]] = color
+
 class Camera:
     def __init__(self):
         self.rotation = R.from_quat([0, 0, 0, 1])
+        self.position = np.zeros(3)
         self.fov = FOV_DEFAULT
         self.aspect_ratio = SCREEN_WIDTH / SCREEN_HEIGHT
         self.near = 0.1
@@ -69,6 +164,9 @@ class Camera:
         
         return move_vec
 
+    def move(self, dx, dy, dz):
+        self.position = self.position - self.translate(dx, dy, dz)
+
     def rotate(self, axis_index, angle):
         axis_vector = np.zeros(3)
         axis_vector[axis_index] = 1
@@ -81,9 +179,27 @@ class Camera:
     def get_projection_matrix(self):
         return perspective_matrix(self.fov, self.aspect_ratio, self.near, self.far)
 
+    def snapshot(self):
+        return CameraSnapshot(self.rotation, self.position, self.fov, self.aspect_ratio, self.near, self.far)
+
     def get_camera_screen_size(self):
         return SCREEN_WIDTH * self.camera_screen_scale, SCREEN_HEIGHT * self.camera_screen_scale
 
+class CameraSnapshot(namedtuple("CameraSnapshot", ["rotation", "position", "fov", "aspect_ratio", "near", "far"])):
+    def get_projection_matrix(self):
+        return perspective_matrix(self.fov, self.aspect_ratio, self.near, self.far)
+
+    @staticmethod
+    def interpolate(previous, current, alpha):
+        if previous is current or alpha >= 1:
+            return current
+        slerp = Slerp([0, 1], R.concatenate([previous.rotation, current.rotation]))
+        return current._replace(
+            rotation=slerp(alpha),
+            position=previous.position + (current.position - previous.position) * alpha,
+            fov=previous.fov + (current.fov - previous.fov) * alpha
+        )
+
 class Prism:
     def __init__(self, size, position):
         self.vertices = create_rectangular_prism(*size)
@@ -104,11 +220,15 @@ class Renderer:
             (4, 5), (5, 6), (6, 7), (7, 4),
             (0, 4), (1, 5), (2, 6), (3, 7)
         ]
+        self.world_vertices = np.array([prism.transformed_vertices() for prism in prisms], dtype=np.float32).reshape(-1, 8, 4)
+        self.framebuffer = np.zeros((SCREEN_WIDTH, SCREEN_HEIGHT, 3), dtype=np.uint8)
+        self.hidden_lines = False
 
-    def apply_transformations(self, vertices):
-        rotated = self.camera.rotation.apply(vertices[:, :3])
+    def apply_transformations(self, vertices, camera=None):
+        camera = self.camera if camera is None else camera
+        rotated = camera.rotation.apply(vertices[:, :3] - camera.position)
         rotated = np.hstack((rotated, vertices[:, 3:]))
-        projection = self.camera.get_projection_matrix()
+        projection = camera.get_projection_matrix()
         projected = rotated @ projection.T
 
         w = projected[:, 3]
@@ -170,11 +290,74 @@ class Renderer:
                     p2 = [x, y]
                     code2 = compute_code(p2[0], p2[1], clip_rect)
 
-    def render(self):
+    def project_vertices(self, camera=None):
+        camera = self.camera if camera is None else camera
+        n = len(self.world_vertices)
+        vertices = self.world_vertices.reshape(-1, 4)
+        rotated = camera.rotation.apply(vertices[:, :3] - camera.position)
+        projected = np.hstack((rotated, vertices[:, 3:])) @ camera.get_projection_matrix().T
+
+        w = projected[:, 3].reshape(n, 8)
+        valid = (np.abs(w) > 0.2) & ~np.all(w <= 0.01, axis=1)[:, None]
+        w_clamped = np.clip(w, 0.1, None)
+        ndc = projected[:, :2].reshape(n, 8, 2) / w_clamped[..., None]
+        screen_pts = np.stack(((ndc[..., 0] + 1) * 0.5 * SCREEN_WIDTH,
+                               (1 - (ndc[..., 1] + 1) * 0.5) * SCREEN_HEIGHT), axis=-1)
+        return screen_pts, w, valid
+
+    def project_edges(self, camera=None):
+        screen_pts, w, valid = self.project_vertices(camera)
+        screen_pts = np.trunc(screen_pts)
+        inv_w = 1 / np.clip(w, 0.1, None)
+
+        edges = np.array(self.edges)
+        keep = (valid[:, edges[:, 0]] & valid[:, edges[:, 1]]).ravel()
+        p0 = screen_pts[:, edges[:, 0]].reshape(-1, 2)[keep]
+        p1 = screen_pts[:, edges[:, 1]].reshape(-1, 2)[keep]
+        z0 = inv_w[:, edges[:, 0]].ravel()[keep]
+        z1 = inv_w[:, edges[:, 1]].ravel()[keep]
+
+        keep, t0, t1 = clip_lines(p0, p1, (0, 0, SCREEN_WIDTH - 1, SCREEN_HEIGHT - 1))
+        dp, dz = p1[keep] - p0[keep], z1[keep] - z0[keep]
+        p0, z0 = p0[keep], z0[keep]
+        return p0 + dp * t0[:, None], p0 + dp * t1[:, None], z0 + dz * t0, z0 + dz * t1
+
+    def build_depth_buffer(self, camera=None):
+        scale = HIDDEN_LINE_SCALE
+        depth = np.zeros((-(-SCREEN_WIDTH // scale), -(-SCREEN_HEIGHT // scale)), dtype=np.float32)
+        screen_pts, w, _ = self.project_vertices(camera)
+
+        # Do bufora trafiają tylko trójkąty w całości przed kamerą
+        in_front = np.all(w[:, FACE_TRIANGLES] > 0.2, axis=2).ravel()
+        xy = screen_pts[:, FACE_TRIANGLES].reshape(-1, 3, 2)[in_front] / scale
+        inv_w = (1 / np.clip(w, 0.1, None))[:, FACE_TRIANGLES].reshape(-1, 3)[in_front]
+        rasterize_depth(depth, np.concatenate((xy, inv_w[..., None]), axis=2))
+
+        # Minimum z sąsiedztwa 3x3, żeby krawędzie na konturach nie znikały
+        padded = np.pad(depth, 1)
+        return np.min([padded[i:i + depth.shape[0], j:j + depth.shape[1]] for i in range(3) for j in range(3)], axis=0)
+
+    def render(self, camera=None):
+        self.framebuffer.fill(0)
+        p0, p1, z0, z1 = self.project_edges(camera)
+
+        sample_filter = None
+        if self.hidden_lines:
+            depth = self.build_depth_buffer(camera)
+
+            def sample_filter(line_idx, t, xs, ys):
+                z = z0[line_idx] + (z1 - z0)[line_idx] * t
+                return z * (1 + HIDDEN_LINE_BIAS) >= depth[xs // HIDDEN_LINE_SCALE, ys // HIDDEN_LINE_SCALE]
+
+        rasterize_lines(self.framebuffer, p0, p1, (255, 255, 255), thickness=2, sample_filter=sample_filter)
+        pygame.surfarray.blit_array(self.screen, self.framebuffer)
+        pygame.display.flip()
+
+    def render_draw_line(self, camera=None):
         self.screen.fill((0, 0, 0))
         for prism in self.prisms:
             transformed = prism.transformed_vertices()
-            screen_verts = self.apply_transformations(transformed)
+            screen_verts = self.apply_transformations(transformed, camera)
             if screen_verts is None:
                 continue
             screen_pts = [(int((v[0] + 1) * 0.5 * SCREEN_WIDTH),
@@ -194,10 +377,19 @@ class Renderer:
 
         pygame.display.flip()
 
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", help="zapisz zdarzenia klawiatury do pliku")
+    parser.add_argument("--replay", help="odtwórz zapis bez okna, z wirtualnym zegarem")
+    parser.add_argument("--timings", help="plik CSV z czasami renderowania klatek podczas odtwarzania")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    if args.replay:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    clock = pygame.time.Clock()
 
     camera = Camera()
     prisms = load_prisms_from_file("prisms.json")
@@ -212,12 +404,12 @@ def main():
         pygame.K_DOWN: lambda: camera.rotate(0, +ROT_SPEED['x']),
         pygame.K_z: lambda: camera.rotate(2, ROT_SPEED['z']),
         pygame.K_c: lambda: camera.rotate(2, -ROT_SPEED['z']),
-        pygame.K_w: lambda: shift_prisms(prisms, camera.translate(0, 0, MOVE_SPEED)),
-        pygame.K_s: lambda: shift_prisms(prisms, camera.translate(0, 0, -MOVE_SPEED)),
-        pygame.K_a: lambda: shift_prisms(prisms, camera.translate(MOVE_SPEED, 0, 0)),
-        pygame.K_d: lambda: shift_prisms(prisms, camera.translate(-MOVE_SPEED, 0, 0)),
-        pygame.K_q: lambda: shift_prisms(prisms, camera.translate(0, MOVE_SPEED, 0)),
-        pygame.K_e: lambda: shift_prisms(prisms, camera.translate(0, -MOVE_SPEED, 0)),
+        pygame.K_w: lambda: camera.move(0, 0, MOVE_SPEED),
+        pygame.K_s: lambda: camera.move(0, 0, -MOVE_SPEED),
+        pygame.K_a: lambda: camera.move(MOVE_SPEED, 0, 0),
+        pygame.K_d: lambda: camera.move(-MOVE_SPEED, 0, 0),
+        pygame.K_q: lambda: camera.move(0, MOVE_SPEED, 0),
+        pygame.K_e: lambda: camera.move(0, -MOVE_SPEED, 0),
         pygame.K_EQUALS: lambda: camera.zoom(-ZOOM_STEP),
         pygame.K_MINUS: lambda: camera.zoom(ZOOM_STEP),
     }
@@ -230,44 +422,88 @@ def main():
         } for key in key_map
     }
 
-    running = True
-    while running:
-        dt = clock.tick(60)
-        current_time = pygame.time.get_ticks()
+    initial = camera.snapshot()
+    snapshots = {"previous": initial, "current": initial, "rendered": initial}
 
+    recorder = InputRecorder(args.record, UPDATE_STEP) if args.record else None
+    replay = InputReplay(args.replay) if args.replay else None
+    timings = []
+
+    def poll_input(step_index):
+        if replay is not None:
+            events = replay.poll(step_index)
+            if step_index >= replay.last_step:
+                events = events + [(EVENT_QUIT, 0)]
+            return events, replay.is_pressed
+
+        events = []
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                running = False
+                events.append((EVENT_QUIT, 0))
             elif event.type == pygame.KEYDOWN:
-                if event.key in key_map and not key_states[event.key]["pressed"]:
-                    key_map[event.key]()
-                    key_states[event.key]["pressed"] = True
-                    key_states[event.key]["start_time"] = current_time
-                    key_states[event.key]["last_repeat"] = current_time
-                    renderer.render()
+                events.append((EVENT_KEYDOWN, event.key))
             elif event.type == pygame.KEYUP:
-                if event.key in key_states:
-                    key_states[event.key]["pressed"] = False
+                events.append((EVENT_KEYUP, event.key))
+        if recorder is not None:
+            for kind, key in events:
+                recorder.record(step_index, kind, key)
 
         keys = pygame.key.get_pressed()
+        return events, lambda key: keys[key]
+
+    def update(sim_time, step):
+        current_time = int(sim_time * 1000)
         any_action = False
+        events, is_pressed = poll_input(scheduler.steps)
+
+        for kind, key in events:
+            if kind == EVENT_QUIT:
+                scheduler.stop()
+            elif kind == EVENT_KEYDOWN:
+                if key in key_map and not key_states[key]["pressed"]:
+                    key_map[key]()
+                    key_states[key]["pressed"] = True
+                    key_states[key]["start_time"] = current_time
+                    key_states[key]["last_repeat"] = current_time
+                    any_action = True
+                elif key == pygame.K_h:
+                    renderer.hidden_lines = not renderer.hidden_lines
+                    any_action = True
+            elif kind == EVENT_KEYUP:
+                if key in key_states:
+                    key_states[key]["pressed"] = False
 
         for key, state in key_states.items():
-            if state["pressed"] and keys[key]:
+            if state["pressed"] and is_pressed(key):
                 if current_time - state["start_time"] > HOLD_START_DELAY:
                     if current_time - state["last_repeat"] > HOLD_REPEAT_INTERVAL:
                         key_map[key]()
                         state["last_repeat"] = current_time
                         any_action = True
 
+        snapshots["previous"] = snapshots["current"]
         if any_action:
-            renderer.render()
-
+            snapshots["current"] = camera.snapshot()
+
+    def render(alpha):
+        previous, current = snapshots["previous"], snapshots["current"]
+        if previous is not current or snapshots["rendered"] is not current:
+            snapshot = CameraSnapshot.interpolate(previous, current, alpha)
+            start = time.perf_counter()
+            renderer.render(snapshot)
+            timings.append((scheduler.steps, time.perf_counter() - start))
+            snapshots["rendered"] = snapshot
+
+    scheduler = LoopScheduler(update, render, step=UPDATE_STEP, max_fps=MAX_FPS)
+    if replay is not None:
+        scheduler.run_virtual()
+        report_timings(timings, args.timings)
+    else:
+        scheduler.run()
+
+    if recorder is not None:
+        recorder.close()
     pygame.quit()
 
-def shift_prisms(prisms, vec):
-    for prism in prisms:
-        prism.position += vec
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
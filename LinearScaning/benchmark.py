@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+import numpy as np
+import pygame
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT
+from camera import Camera
+from prism import Prism
+from renderer import Renderer
+from mesh import Mesh, create_sphere
+from spatial import SpatialIndex, ray_box, box_distance
+from scene_watch import SceneWatcher, SceneReloader
+
+def grid_prisms(size=8, depth=4):
+    return [Prism([0.9, 0.9, 0.9], [x - size / 2, y - size / 2, -10 - 2 * z], (40 * z % 256, 25 * x % 256, 30 * y % 256))
+            for z in range(depth) for x in range(size) for y in range(size)]
+
+def unpack(img_buffer, screen):
+    if img_buffer.ndim == 3:
+        return img_buffer
+    surface = pygame.Surface(img_buffer.shape[::-1], 0, screen)
+    pygame.surfarray.blit_array(surface, img_buffer.T)
+    return np.transpose(pygame.surfarray.array3d(surface), (1, 0, 2))
+
+def measure(renderer, repeats=3):
+    renderer.present(renderer.render_frame())
+    start = time.perf_counter()
+    for _ in range(repeats):
+        img_buffer = renderer.render_frame()
+        renderer.present(img_buffer)
+    return (time.perf_counter() - start) / repeats, img_buffer
+
+def compare_buffers(screen):
+    camera = Camera()
+    camera.rotate(1, 0.3)
+    renderer = Renderer(screen, camera, grid_prisms())
+
+    results = {}
+    for compact in (False, True):
+        renderer.compact_buffers = compact
+        zbuffer, img_buffer = renderer.new_buffers()
+        elapsed, frame = measure(renderer)
+        results[compact] = unpack(frame, screen)
+        name = "compact" if compact else "float32"
+        print(f"{name:8s}: bufory {(zbuffer.nbytes + img_buffer.nbytes) / 2**20:6.2f} MiB, klatka {elapsed * 1000:8.2f} ms")
+
+    differing = np.any(results[False] != results[True], axis=2)
+    print(f"różne piksele: {differing.sum()} ({differing.mean() * 100:.4f}%)")
+
+def mesh_throughput(screen):
+    renderer = Renderer(screen, Camera(), [])
+    for sectors, stacks in ((40, 40), (250, 200), (500, 400), (1000, 800)):
+        for distance in (12, 60):
+            vertices, triangles = create_sphere(3, sectors, stacks)
+            renderer.meshes = [Mesh(vertices, triangles, (0, 0, -distance), (200, 80, 60))]
+            elapsed, _ = measure(renderer)
+            drawn = renderer.stats["triangles_drawn"]
+            print(f"{len(triangles):8d} trójkątów, odległość {distance:3d}: narysowano {drawn:7d}, "
+                  f"klatka {elapsed * 1000:8.2f} ms, {drawn / elapsed / 1e6:6.2f} mln trójkątów/s")
+
+def best_time(query, repeats=50):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        query()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000, np.median(times) * 1000
+
+def spatial_throughput(count=1_000_000, batch=1000):
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(-500, 500, (count, 3))
+    half = rng.uniform(0.2, 2, (count, 3))
+    mins, maxs = centers - half, centers + half
+
+    start = time.perf_counter()
+    index = SpatialIndex(mins, maxs)
+    print(f"{count} prostopadłościanów, budowa indeksu {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    camera = Camera()
+    camera.rotate(1, 0.3)
+    origin, direction = camera.screen_ray(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
+    with np.errstate(divide="ignore"):
+        inv_dir = 1 / direction
+    point = camera.position
+    low, high = point - 10, point + 10
+
+    queries = [
+        ("promień z ekranu", lambda: index.ray_cast(origin, direction),
+         lambda: ray_box(origin[:, None], inv_dir[:, None], mins.T, maxs.T)),
+        ("10 najbliższych", lambda: index.nearest(point, 10),
+         lambda: np.argpartition(box_distance(point[:, None], mins.T, maxs.T), 10)),
+        ("prostopadłościany w pudełku", lambda: index.query_boxes(low, high),
+         lambda: np.flatnonzero(np.all(mins <= high, axis=1) & np.all(maxs >= low, axis=1))),
+    ]
+    for name, query, scan in queries:
+        best, median = best_time(query)
+        scan_best, _ = best_time(scan, repeats=3)
+        print(f"{name:28s}: indeks {best:7.3f} ms (mediana {median:7.3f}), pełne przeszukanie {scan_best:8.2f} ms")
+
+    xs = rng.uniform(0, SCREEN_WIDTH, batch)
+    ys = rng.uniform(0, SCREEN_HEIGHT, batch)
+    origins, directions = camera.screen_ray(xs, ys)
+    points = rng.uniform(-500, 500, (batch, 3))
+    for name, query in (("promienie z ekranu", lambda: index.ray_cast(origins, directions)),
+                        ("10 najbliższych", lambda: index.nearest(points, 10)),
+                        ("pudełka", lambda: index.query_boxes(points - 10, points + 10))):
+        best, _ = best_time(query, repeats=3)
+        print(f"paczka {batch} zapytań, {name:20s}: {best:8.2f} ms, {batch / best * 1000:9.0f} zapytań/s")
+
+def scene_reload(count=1_000_000):
+    rng = np.random.default_rng(0)
+    items = [{"size": size, "position": position, "color": [100, 150, 200]}
+             for size, position in zip(rng.integers(1, 4, (count, 3)).tolist(), rng.integers(-500, 500, (count, 3)).tolist())]
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+
+    def write(data):
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=1)
+        # Zapis w tej samej chwili i o tym samym rozmiarze też ma być zauważony
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    try:
+        write(items)
+        start = time.perf_counter()
+        prisms = Prism.load_prisms_from_file(path)
+        index = SpatialIndex.from_prisms(prisms)
+        full = (time.perf_counter() - start) * 1000
+        print(f"{count} prostopadłościanów, pełne wczytanie z indeksem {full:.0f} ms")
+
+        # Ściany i BSP pomijamy: przy milionie prostopadłościanów mierzymy wczytanie i indeks
+        reloader = SceneReloader(SceneWatcher(path), prisms, index)
+        renderer = SimpleNamespace(prisms=list(prisms), faces=None, bsp=None)
+        middle = count // 2
+        edits = (
+            ("zmiana koloru", lambda: items[middle].update(color=[255, 0, 0])),
+            ("nowy prostopadłościan", lambda: items.insert(middle, {"size": [2, 2, 2], "position": [0, 0, -30]})),
+            ("usunięcie", lambda: items.pop(middle + 1)),
+        )
+        for name, edit in edits:
+            edit()
+            write(items)
+            # Porównanie i aktualizacja indeksu działają w wątku w tle, renderer tylko podmienia listę
+            start = time.perf_counter()
+            change = reloader.watcher.poll()
+            polled = time.perf_counter()
+            update = reloader.prepare(change)
+            prepared = time.perf_counter()
+            update.apply(renderer)
+            applied = time.perf_counter()
+            print(f"{name:22s}: porównanie pliku {(polled - start) * 1000:7.1f} ms, indeks {(prepared - polled) * 1000:6.2f} ms, "
+                  f"między klatkami {(applied - prepared) * 1000:5.2f} ms, zmienione elementy {change[0]}:{change[1]} -> {len(change[2])}")
+    finally:
+        os.remove(path)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--meshes", action="store_true", help="przepustowość rasteryzacji siatek trójkątów")
+    parser.add_argument("--spatial", action="store_true", help="przepustowość zapytań indeksu przestrzennego")
+    parser.add_argument("--reload", action="store_true", help="przyrostowe przeładowanie dużej sceny")
+    args = parser.parse_args()
+    if args.reload:
+        scene_reload()
+        return
+    if args.spatial:
+        spatial_throughput()
+        return
+
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    if args.meshes:
+        mesh_throughput(screen)
+    else:
+        compare_buffers(screen)
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
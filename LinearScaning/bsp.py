@@ -0,0 +1,197 @@
+import hashlib
+import os
+import numpy as np
+from prism import Prism
+
+EPSILON = 1e-5
+SPLITTER_CANDIDATES = 8
+
+def polygon_plane(points):
+    normal = np.cross(points[1] - points[0], points[2] - points[0])
+    normal /= np.linalg.norm(normal)
+    return np.append(normal, -normal @ points[0])
+
+def split_polygon(points, distances):
+    front, back = [], []
+    n = len(points)
+    for i in range(n):
+        j = (i + 1) % n
+        p, q = points[i], points[j]
+        dp, dq = distances[i], distances[j]
+        if dp >= -EPSILON:
+            front.append(p)
+        if dp <= EPSILON:
+            back.append(p)
+        # Krawędź przecina płaszczyznę - dodajemy punkt przecięcia do obu części
+        if (dp > EPSILON and dq < -EPSILON) or (dp < -EPSILON and dq > EPSILON):
+            r = p + (q - p) * (dp / (dp - dq))
+            front.append(r)
+            back.append(r)
+    return np.array(front), np.array(back)
+
+class BSPTree:
+    def __init__(self, planes, front, back, node_start, node_count, points, vertex_counts, colors):
+        self.planes = planes
+        self.front = front
+        self.back = back
+        self.node_start = node_start
+        self.node_count = node_count
+        self.points = points
+        self.vertex_counts = vertex_counts
+        self.vertex_starts = np.cumsum(vertex_counts) - vertex_counts
+        self.colors = colors
+
+    def __len__(self):
+        return len(self.vertex_counts)
+
+    def polygon(self, i):
+        start = self.vertex_starts[i]
+        return self.points[start:start + self.vertex_counts[i]]
+
+    @staticmethod
+    def from_prisms(prisms):
+        return BSPTree.from_faces(Prism.extract_faces([(prism.transformed_vertices(), prism.color) for prism in prisms]))
+
+    @staticmethod
+    def from_faces(faces):
+        polygons = [np.array(face["points"], dtype=np.float64)[:, :3] for face in faces]
+        return BSPTree.build(polygons, [face["color"] for face in faces])
+
+    @staticmethod
+    def build(polygons, colors):
+        planes, front, back, node_polygons = [], [], [], []
+        # (wielokąty, kolory, indeks rodzica, czy jest przednim dzieckiem)
+        stack = [(polygons, colors, -1, False)] if polygons else []
+
+        while stack:
+            polys, cols, parent, is_front = stack.pop()
+            node = len(planes)
+            if parent >= 0:
+                (front if is_front else back)[parent] = node
+
+            plane = BSPTree.choose_splitter(polys)
+            planes.append(plane)
+            front.append(-1)
+            back.append(-1)
+
+            here, front_polys, back_polys = [], ([], []), ([], [])
+            for points, color in zip(polys, cols):
+                distances = points @ plane[:3] + plane[3]
+                if np.all(np.abs(distances) <= EPSILON):
+                    here.append((points, color))
+                elif np.all(distances >= -EPSILON):
+                    front_polys[0].append(points)
+                    front_polys[1].append(color)
+                elif np.all(distances <= EPSILON):
+                    back_polys[0].append(points)
+                    back_polys[1].append(color)
+                else:
+                    f, b = split_polygon(points, distances)
+                    if len(f) >= 3:
+                        front_polys[0].append(f)
+                        front_polys[1].append(color)
+                    if len(b) >= 3:
+                        back_polys[0].append(b)
+                        back_polys[1].append(color)
+            node_polygons.append(here)
+
+            if front_polys[0]:
+                stack.append((front_polys[0], front_polys[1], node, True))
+            if back_polys[0]:
+                stack.append((back_polys[0], back_polys[1], node, False))
+
+        node_count = np.array([len(here) for here in node_polygons], dtype=np.int64)
+        flat = [item for here in node_polygons for item in here]
+        return BSPTree(
+            np.array(planes, dtype=np.float64).reshape(-1, 4),
+            np.array(front, dtype=np.int64),
+            np.array(back, dtype=np.int64),
+            np.cumsum(node_count) - node_count,
+            node_count,
+            np.concatenate([points for points, _ in flat]) if flat else np.empty((0, 3)),
+            np.array([len(points) for points, _ in flat], dtype=np.int64),
+            np.array([color for _, color in flat], dtype=np.uint8).reshape(-1, 3)
+        )
+
+    @staticmethod
+    def choose_splitter(polys):
+        # Spośród kilku kandydatów wybieramy płaszczyznę z najmniejszą liczbą podziałów
+        if len(polys) == 1:
+            return polygon_plane(polys[0])
+
+        counts = np.array([len(points) for points in polys])
+        starts = np.cumsum(counts) - counts
+        points = np.concatenate(polys)
+        candidates = np.unique(np.linspace(0, len(polys) - 1, min(SPLITTER_CANDIDATES, len(polys))).astype(int))
+
+        best, best_score = None, None
+        for i in candidates:
+            plane = polygon_plane(polys[i])
+            distances = points @ plane[:3] + plane[3]
+            in_front = np.maximum.reduceat(distances, starts) > EPSILON
+            behind = np.minimum.reduceat(distances, starts) < -EPSILON
+            splits = np.sum(in_front & behind)
+            score = 8 * splits + abs(int(np.sum(in_front & ~behind)) - int(np.sum(behind & ~in_front)))
+            if best_score is None or score < best_score:
+                best, best_score = plane, score
+        return best
+
+    def traverse(self, eye, front_to_back=True):
+        order = []
+        stack = [(0, False)] if len(self.planes) else []
+        while stack:
+            node, emit = stack.pop()
+            if emit:
+                start = self.node_start[node]
+                order.extend(range(start, start + self.node_count[node]))
+                continue
+
+            eye_in_front = self.planes[node, :3] @ eye + self.planes[node, 3] >= 0
+            near, far = (self.front[node], self.back[node]) if eye_in_front else (self.back[node], self.front[node])
+            if not front_to_back:
+                near, far = far, near
+
+            if far >= 0:
+                stack.append((far, False))
+            stack.append((node, True))
+            if near >= 0:
+                stack.append((near, False))
+        return order
+
+    def save(self, path, key=""):
+        np.savez_compressed(
+            path, key=key, planes=self.planes, front=self.front, back=self.back,
+            node_start=self.node_start, node_count=self.node_count,
+            points=self.points, vertex_counts=self.vertex_counts, colors=self.colors
+        )
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            return BSPTree(
+                data["planes"], data["front"], data["back"], data["node_start"], data["node_count"],
+                data["points"], data["vertex_counts"], data["colors"]
+            )
+
+def faces_key(faces):
+    # Skrót ścian wejściowych i parametrów budowy: zmiana sceny albo sposobu tworzenia ścian unieważnia drzewo
+    digest = hashlib.blake2b(np.array([EPSILON, SPLITTER_CANDIDATES]).tobytes(), digest_size=16)
+    for face in faces:
+        digest.update(np.array(face["points"], dtype=np.float64)[:, :3].tobytes())
+        digest.update(np.array(face["color"], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def load_or_build_bsp(scene_path, faces):
+    # Drzewo zapisujemy obok pliku sceny razem ze skrótem ścian, z których powstało
+    cache_path = os.path.splitext(scene_path)[0] + ".bsp.npz"
+    faces = list(faces)
+    key = faces_key(faces)
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            cached = str(data["key"]) if "key" in data else None
+        if cached == key:
+            return BSPTree.load(cache_path)
+
+    tree = BSPTree.from_faces(faces)
+    tree.save(cache_path, key)
+    return tree
@@ -1,10 +1,12 @@
 from constants import SCREEN_WIDTH, SCREEN_HEIGHT, FOV_DEFAULT, FOV_LIMITS
-from scipy.spatial.transform import Rotation as R
+from scipy.spatial.transform import Rotation as R, Slerp
+from collections import namedtuple
 import numpy as np
 
 class Camera:
     def __init__(self):
         self.rotation = R.from_quat([0, 0, 0, 1])
+        self.position = np.zeros(3)
         self.fov = FOV_DEFAULT
         self.aspect_ratio = SCREEN_WIDTH / SCREEN_HEIGHT
         self.near = 0.1
@@ -17,13 +19,17 @@ class Camera:
         
         return move_vec
 
+    def move(self, dx, dy, dz):
+        self.position = self.position - self.translate(dx, dy, dz)
+
     def rotate(self, axis_index, angle):
         axis_vector = np.zeros(3)
         axis_vector[axis_index] = 1
         delta_rotation = R.from_rotvec(axis_vector * angle)
         self.rotation = delta_rotation * self.rotation
 
-    def perspective_matrix(self, fov, aspect_ratio, near, far):
+    @staticmethod
+    def perspective_matrix(fov, aspect_ratio, near, far):
         tan_fov = np.tan(np.radians(fov) / 2)
         return np.array([
             [1 / (aspect_ratio * tan_fov),  0,              0,                                  0],
@@ -38,5 +44,33 @@ class Camera:
     def get_projection_matrix(self):
         return self.perspective_matrix(self.fov, self.aspect_ratio, self.near, self.far)
 
+    def screen_ray(self, x, y, size=(SCREEN_WIDTH, SCREEN_HEIGHT)):
+        # Odwrotność rzutowania z Renderer.apply_transformations dla środka piksela (x, y)
+        projection = self.get_projection_matrix()
+        ndc_x = 2 * (np.asarray(x, dtype=np.float64) + 0.5) / size[0] - 1
+        ndc_y = 1 - 2 * (np.asarray(y, dtype=np.float64) + 0.5) / size[1]
+        w = -projection[3, 2]
+        direction = np.stack((ndc_x * w / projection[0, 0], ndc_y * w / projection[1, 1], -np.ones_like(ndc_x)), axis=-1)
+        direction = self.rotation.inv().apply(direction)
+        return np.broadcast_to(self.position, direction.shape), direction
+
+    def snapshot(self):
+        return CameraSnapshot(self.rotation, self.position, self.fov, self.aspect_ratio, self.near, self.far)
+
     def get_camera_screen_size(self):
-        return SCREEN_WIDTH * self.camera_screen_scale, SCREEN_HEIGHT * self.camera_screen_scale
\ No newline at end of file
+        return SCREEN_WIDTH * self.camera_screen_scale, SCREEN_HEIGHT * self.camera_screen_scale
+
+class CameraSnapshot(namedtuple("CameraSnapshot", ["rotation", "position", "fov", "aspect_ratio", "near", "far"])):
+    def get_projection_matrix(self):
+        return Camera.perspective_matrix(self.fov, self.aspect_ratio, self.near, self.far)
+
+    @staticmethod
+    def interpolate(previous, current, alpha):
+        if previous is current or alpha >= 1:
+            return current
+        slerp = Slerp([0, 1], R.concatenate([previous.rotation, current.rotation]))
+        return current._replace(
+            rotation=slerp(alpha),
+            position=previous.position + (current.position - previous.position) * alpha,
+            fov=previous.fov + (current.fov - previous.fov) * alpha
+        )
@@ -2,9 +2,24 @@ import math
 
 SCREEN_WIDTH, SCREEN_HEIGHT = 1600, 900
 
+SCENE_PATH = "prisms3.json"
+MESH_SCENE_PATH = None
+WATCH_SCENE = False
+BSP_MODE = False
+OPTIMIZE_FACES = True
+
+DYNAMIC_RESOLUTION = False
+FRAME_BUDGET = 1 / 15
+RESOLUTION_SCALE_LIMITS = (0.25, 1.0)
+RESOLUTION_SMOOTHING = 0.3
+
 HOLD_START_DELAY = 400
 HOLD_REPEAT_INTERVAL = 50
 
+UPDATE_STEP = 1 / 120
+MAX_FPS = 60
+RENDER_THREAD = True
+
 FOV_DEFAULT = 90
 MOVE_SPEED = 1
 ROT_SPEED = {
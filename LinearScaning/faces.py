@@ -0,0 +1,181 @@
+import numpy as np
+from prism import FACE_INDICES
+
+QUANTUM = 1e-6
+
+def quantize(values):
+    return np.rint(values / QUANTUM).astype(np.int64)
+
+def prism_face_rects(prisms):
+    # Każda ściana jako prostokąt: oś normalnej, zwrot, położenie płaszczyzny i zakresy (u, v)
+    vertices = np.array([prism.transformed_vertices()[:, :3] for prism in prisms], dtype=np.float64).reshape(-1, 8, 3)
+    quads = vertices[:, FACE_INDICES].reshape(-1, 4, 3)
+    colors = np.repeat(np.array([prism.color for prism in prisms], dtype=np.int64).reshape(-1, 3), len(FACE_INDICES), axis=0)
+
+    normals = np.cross(quads[:, 1] - quads[:, 0], quads[:, 2] - quads[:, 0])
+    axis = np.argmax(np.abs(normals), axis=1)
+    sign = np.sign(normals[np.arange(len(quads)), axis]).astype(np.int64)
+    coord = quads[np.arange(len(quads)), 0, axis]
+
+    u_axis, v_axis = (axis + 1) % 3, (axis + 2) % 3
+    u = quads[np.arange(len(quads))[:, None], np.arange(4), u_axis[:, None]]
+    v = quads[np.arange(len(quads))[:, None], np.arange(4), v_axis[:, None]]
+    return axis, sign, coord, u.min(axis=1), u.max(axis=1), v.min(axis=1), v.max(axis=1), colors
+
+def hidden_face_mask(axis, sign, coord, u0, u1, v0, v1):
+    # Ściany leżące na sobie z przeciwnymi zwrotami zasłaniają się nawzajem
+    key = np.column_stack((axis, quantize(coord), quantize(u0), quantize(u1), quantize(v0), quantize(v1)))
+    _, group = np.unique(key, axis=0, return_inverse=True)
+    group = group.ravel()
+    has_front = np.bincount(group, weights=sign > 0) > 0
+    has_back = np.bincount(group, weights=sign < 0) > 0
+    hidden = has_front[group] & has_back[group]
+
+    # Pozostałe: ściana zawarta w przeciwnej ścianie większego sąsiada
+    plane = np.column_stack((axis, quantize(coord)))
+    _, plane_group = np.unique(plane, axis=0, return_inverse=True)
+    order = np.argsort(plane_group.ravel(), kind="stable")
+    bounds = np.flatnonzero(np.diff(plane_group.ravel()[order])) + 1
+    for members in np.split(order, bounds):
+        candidates = members[~hidden[members]]
+        for s in (1, -1):
+            faces = candidates[sign[candidates] == s]
+            covers = members[sign[members] == -s]
+            if len(faces) == 0 or len(covers) == 0:
+                continue
+            for chunk in np.array_split(faces, -(-len(faces) // 1024)):
+                contained = ((u0[covers][None, :] <= u0[chunk][:, None] + QUANTUM) &
+                             (u1[covers][None, :] >= u1[chunk][:, None] - QUANTUM) &
+                             (v0[covers][None, :] <= v0[chunk][:, None] + QUANTUM) &
+                             (v1[covers][None, :] >= v1[chunk][:, None] - QUANTUM))
+                hidden[chunk[contained.any(axis=1)]] = True
+    return hidden
+
+def merge_runs(group, a0, a1, b0, b1):
+    # Łączy prostokąty przylegające wzdłuż osi a, o identycznym zakresie na osi b
+    if len(group) == 0:
+        return group, a0, a1, b0, b1
+    order = np.lexsort((a0, b1, b0, group))
+    group, a0, a1, b0, b1 = group[order], a0[order], a1[order], b0[order], b1[order]
+    q0, q1 = quantize(a0), quantize(a1)
+    same_strip = (group[1:] == group[:-1]) & (quantize(b0[1:]) == quantize(b0[:-1])) & (quantize(b1[1:]) == quantize(b1[:-1]))
+    continues = same_strip & (q0[1:] == q1[:-1])
+    starts = np.flatnonzero(np.concatenate(([True], ~continues)))
+    return group[starts], a0[starts], np.maximum.reduceat(a1, starts), b0[starts], b1[starts]
+
+def merged_rects(axis, sign, coord, u0, u1, v0, v1, colors, remove_hidden=True, merge=True):
+    if remove_hidden:
+        visible = ~hidden_face_mask(axis, sign, coord, u0, u1, v0, v1)
+        axis, sign, coord, u0, u1, v0, v1, colors = (a[visible] for a in (axis, sign, coord, u0, u1, v0, v1, colors))
+    if len(axis) == 0:
+        # Wszystkie ściany zasłonięte, np. płaszczyzna wewnątrz bryły
+        return axis, sign, coord, u0, u1, v0, v1, colors
+
+    # Łączymy tylko ściany na tej samej płaszczyźnie, o tym samym zwrocie i kolorze
+    key = np.column_stack((axis, sign, quantize(coord), colors))
+    _, first, group = np.unique(key, axis=0, return_index=True, return_inverse=True)
+    group = group.ravel()
+    if merge:
+        group, u0, u1, v0, v1 = merge_runs(group, u0, u1, v0, v1)
+        group, v0, v1, u0, u1 = merge_runs(group, v0, v1, u0, u1)
+    return axis[first][group], sign[first][group], coord[first][group], u0, u1, v0, v1, colors[first][group]
+
+def rect_faces(axis, sign, coord, u0, u1, v0, v1, colors):
+    faces = []
+    for k, s, c, a0, a1, b0, b1, color in zip(axis, sign, coord, u0, u1, v0, v1, colors):
+        # Kolejność wierzchołków daje normalną zgodną ze zwrotem ściany
+        corners = [(a0, b0), (a1, b0), (a1, b1), (a0, b1)]
+        if s < 0:
+            corners.reverse()
+        points = np.ones((4, 4))
+        for i, (a, b) in enumerate(corners):
+            points[i, k] = c
+            points[i, (k + 1) % 3] = a
+            points[i, (k + 2) % 3] = b
+        faces.append({
+            "points": points,
+            "color": tuple(int(x) for x in color)
+        })
+    return faces
+
+def build_scene_faces(prisms, remove_hidden=True, merge=True):
+    if not prisms:
+        return []
+    return rect_faces(*merged_rects(*prism_face_rects(prisms), remove_hidden, merge))
+
+def plane_keys(axis, coord):
+    # Jedna liczba na płaszczyznę: oś i skwantowane położenie
+    return quantize(coord) * 3 + axis
+
+def plane_slabs(keys):
+    # Cienkie pudełka wokół płaszczyzn, do wyszukania leżących na nich prostopadłościanów
+    axis = keys % 3
+    coord = (keys // 3) * QUANTUM
+    lows = np.full((len(keys), 3), -np.inf)
+    highs = np.full((len(keys), 3), np.inf)
+    lows[np.arange(len(keys)), axis] = coord - QUANTUM
+    highs[np.arange(len(keys)), axis] = coord + QUANTUM
+    return lows, highs
+
+class SceneFaces:
+    # Ściany sceny pogrupowane według płaszczyzn: zakrywanie i łączenie działa tylko w obrębie płaszczyzny,
+    # więc po zmianie prostopadłościanu wystarczy przeliczyć płaszczyzny, na których leżą jego ściany
+    def __init__(self, prisms, remove_hidden=True, merge=True):
+        self.remove_hidden = remove_hidden
+        self.merge = merge
+        self.planes = {}
+        self.count = 0
+        if prisms:
+            self.rebuild_planes(None, prisms)
+
+    def __iter__(self):
+        for faces in self.planes.values():
+            yield from faces
+
+    def __len__(self):
+        return self.count
+
+    def planes_of(self, prisms):
+        if not prisms:
+            return np.empty(0, dtype=np.int64)
+        axis, _, coord, *_ = prism_face_rects(prisms)
+        return np.unique(plane_keys(axis, coord))
+
+    def copy(self):
+        # Płytka kopia: listy ścian są wspólne, bo przebudowa płaszczyzny podmienia całą listę
+        faces = SceneFaces(None, self.remove_hidden, self.merge)
+        faces.planes = dict(self.planes)
+        faces.count = self.count
+        return faces
+
+    def plane_faces(self, prisms, keys=None):
+        # prisms musi zawierać wszystkie prostopadłościany mające ściany na płaszczyznach keys (None = wszystkie)
+        if not prisms:
+            return {}
+        rects = prism_face_rects(prisms)
+        if keys is not None:
+            inside = np.isin(plane_keys(rects[0], rects[2]), keys)
+            rects = tuple(a[inside] for a in rects)
+        if len(rects[0]) == 0:
+            return {}
+
+        merged = merged_rects(*rects, self.remove_hidden, self.merge)
+        key = plane_keys(merged[0], merged[2])
+        if len(key) == 0:
+            return {}
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        faces = rect_faces(*(a[order] for a in merged))
+        starts = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+        ends = np.append(starts[1:], len(key))
+        return {int(key[start]): faces[start:end] for start, end in zip(starts, ends)}
+
+    def replace_planes(self, keys, planes):
+        for key in keys.tolist():
+            self.count -= len(self.planes.pop(key, ()))
+        self.planes.update(planes)
+        self.count += sum(len(faces) for faces in planes.values())
+
+    def rebuild_planes(self, keys, prisms):
+        planes = self.plane_faces(prisms, keys)
+        self.replace_planes(keys if keys is not None else np.empty(0, dtype=np.int64), planes)
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+# Komunikat pygame na stdout zepsułby strumień surowych klatek
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+from scipy.spatial.transform import Rotation as R
+
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, SCENE_PATH, OPTIMIZE_FACES, FOV_DEFAULT
+from camera import Camera, CameraSnapshot
+from prism import Prism
+from faces import build_scene_faces
+from renderer import Renderer
+
+FRAME_SHAPE = (SCREEN_HEIGHT, SCREEN_WIDTH, 3)
+
+# Stan procesu roboczego, ustawiany raz w init_worker
+worker = {}
+
+def load_camera_path(path, frames=None):
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    base = Camera().snapshot()
+    keys = [base._replace(
+        rotation=R.from_quat(item.get("rotation", [0, 0, 0, 1])),
+        position=np.array(item.get("position", [0, 0, 0]), dtype=np.float64),
+        fov=item.get("fov", FOV_DEFAULT)
+    ) for item in data]
+
+    frames = len(keys) if frames is None else frames
+    if len(keys) == 1:
+        return [keys[0]] * frames
+
+    snapshots = []
+    for i in range(frames):
+        t = i / max(frames - 1, 1) * (len(keys) - 1)
+        k = min(int(t), len(keys) - 2)
+        snapshots.append(CameraSnapshot.interpolate(keys[k], keys[k + 1], t - k))
+    return snapshots
+
+def share_array(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm
+
+def attach_array(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def init_worker(points_spec, colors_spec, frames_spec):
+    # Procesy robocze tylko podpinają się pod wspólną pamięć, scena nie jest kopiowana
+    points_shm, points = attach_array(*points_spec)
+    colors_shm, colors = attach_array(*colors_spec)
+    frames_shm, frames = attach_array(*frames_spec)
+
+    renderer = Renderer(None, Camera(), [])
+    renderer.faces = [{"points": p, "color": tuple(int(c) for c in color)} for p, color in zip(points, colors)]
+    worker.update(renderer=renderer, frames=frames, blocks=(points_shm, colors_shm, frames_shm))
+
+def render_task(index, slot, snapshot):
+    worker["frames"][slot] = worker["renderer"].render_frame(snapshot)
+    return index, slot
+
+class PngSequenceWriter:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, index, frame):
+        surface = pygame.surfarray.make_surface(np.transpose(frame, (1, 0, 2)))
+        pygame.image.save(surface, os.path.join(self.directory, f"frame_{index:05d}.png"))
+
+    def close(self):
+        pass
+
+class RawVideoWriter:
+    # Surowe klatki RGB24, np. dla: ffmpeg -f rawvideo -pix_fmt rgb24 -s 1600x900 -i -
+    def __init__(self, path):
+        self.stream = sys.stdout.buffer if path == "-" else open(path, "wb")
+
+    def write(self, index, frame):
+        self.stream.write(np.ascontiguousarray(frame).tobytes())
+
+    def close(self):
+        self.stream.flush()
+        if self.stream is not sys.stdout.buffer:
+            self.stream.close()
+
+def render_path(scene_path, snapshots, writer, workers=None, max_in_flight=None):
+    prisms = Prism.load_prisms_from_file(scene_path)
+    if OPTIMIZE_FACES:
+        faces = build_scene_faces(prisms)
+    else:
+        faces = Prism.extract_faces([(prism.transformed_vertices(), prism.color) for prism in prisms])
+
+    workers = workers or os.cpu_count()
+    max_in_flight = max_in_flight or 2 * workers
+    points = np.array([face["points"] for face in faces], dtype=np.float64).reshape(-1, 4, 4)
+    colors = np.array([face["color"] for face in faces], dtype=np.uint8).reshape(-1, 3)
+
+    points_shm = share_array(points)
+    colors_shm = share_array(colors)
+    # Pierścień slotów na gotowe klatki ogranicza pamięć do max_in_flight klatek
+    frames_shape = (max_in_flight,) + FRAME_SHAPE
+    frames_shm = shared_memory.SharedMemory(create=True, size=int(np.prod(frames_shape)))
+    frames = np.ndarray(frames_shape, dtype=np.uint8, buffer=frames_shm.buf)
+
+    try:
+        initargs = (
+            (points_shm.name, points.shape, points.dtype),
+            (colors_shm.name, colors.shape, colors.dtype),
+            (frames_shm.name, frames_shape, np.uint8)
+        )
+        with Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+            tasks = iter(enumerate(snapshots))
+            free_slots = list(range(max_in_flight))
+            pending = deque()
+            while True:
+                while free_slots:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    index, snapshot = task
+                    pending.append(pool.apply_async(render_task, (index, free_slots.pop(), snapshot)))
+
+                if not pending:
+                    break
+
+                # Klatki zapisujemy w kolejności, nawet jeśli późniejsze są już gotowe
+                index, slot = pending.popleft().get()
+                writer.write(index, frames[slot])
+                free_slots.append(slot)
+    finally:
+        writer.close()
+        del frames
+        for shm in (points_shm, colors_shm, frames_shm):
+            shm.close()
+            shm.unlink()
+
+def main():
+    parser = argparse.ArgumentParser(description="Renderowanie wielu klatek sceny wzdłuż ścieżki kamery")
+    parser.add_argument("camera_path", help="plik JSON z klatkami kluczowymi: position, rotation (kwaternion), fov")
+    parser.add_argument("output", help="katalog na pliki PNG albo plik/potok dla --raw ('-' = stdout)")
+    parser.add_argument("--scene", default=SCENE_PATH)
+    parser.add_argument("--frames", type=int, default=None, help="liczba klatek interpolowanych między kluczowymi")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    parser.add_argument("--raw", action="store_true", help="zapis surowych klatek RGB24 zamiast PNG")
+    args = parser.parse_args()
+
+    snapshots = load_camera_path(args.camera_path, args.frames)
+    writer = RawVideoWriter(args.output) if args.raw else PngSequenceWriter(args.output)
+    render_path(args.scene, snapshots, writer, args.workers, args.max_in_flight)
+
+if __name__ == "__main__":
+    main()
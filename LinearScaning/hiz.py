@@ -0,0 +1,26 @@
+import numpy as np
+
+def reduce_max(block):
+    # Nieparzyste brzegi dopełniamy kopią krawędzi, co nie zmienia maksimum
+    h, w = block.shape
+    padded = np.pad(block, ((0, h % 2), (0, w % 2)), mode="edge")
+    return padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).max(axis=(1, 3))
+
+class DepthPyramid:
+    def __init__(self, zbuffer, max_levels=8):
+        self.levels = [zbuffer]
+        while len(self.levels) < max_levels and max(self.levels[-1].shape) > 1:
+            self.levels.append(reduce_max(self.levels[-1]))
+
+    def update(self, x0, y0, x1, y1):
+        for k in range(1, len(self.levels)):
+            x0, y0, x1, y1 = x0 >> 1, y0 >> 1, x1 >> 1, y1 >> 1
+            block = self.levels[k - 1][2 * y0:2 * y1 + 2, 2 * x0:2 * x1 + 2]
+            self.levels[k][y0:y1 + 1, x0:x1 + 1] = reduce_max(block)
+
+    def is_occluded(self, x0, y0, x1, y1, min_depth):
+        # Poziom, na którym prostokąt obejmuje najwyżej kilka kafelków
+        size = max(x1 - x0, y1 - y0) + 1
+        level = min(max(int(size).bit_length() - 2, 0), len(self.levels) - 1)
+        tiles = self.levels[level][y0 >> level:(y1 >> level) + 1, x0 >> level:(x1 >> level) + 1]
+        return min_depth >= tiles.max()
@@ -1,17 +1,54 @@
+import argparse
+import os
+import sys
+from contextlib import nullcontext
+import time
 import pygame
+# Moduły wspólne dla wszystkich przeglądarek leżą w katalogu common obok katalogu tego skryptu
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
 from constants import *
 from prism import Prism
+from mesh import Mesh
 from renderer import Renderer
-from camera import Camera
+from camera import Camera, CameraSnapshot
+from scheduler import LoopScheduler, RenderThread
+from bsp import load_or_build_bsp
+from faces import SceneFaces
+from resolution import ResolutionScaler
+from spatial import SpatialIndex
+from scene_watch import SceneWatcher, SceneReloader
+from input_log import InputRecorder, InputReplay, EVENT_KEYDOWN, EVENT_KEYUP, EVENT_QUIT, report_timings
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--record", help="zapisz zdarzenia klawiatury do pliku")
+    parser.add_argument("--replay", help="odtwórz zapis bez okna, z wirtualnym zegarem")
+    parser.add_argument("--timings", help="plik CSV z czasami renderowania klatek podczas odtwarzania")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    if args.replay:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.DOUBLEBUF)
-    clock = pygame.time.Clock()
 
     camera = Camera()
-    prisms = Prism.load_prisms_from_file("prisms3.json")
-    renderer = Renderer(screen, camera, prisms)
+    prisms = Prism.load_prisms_from_file(SCENE_PATH)
+    # Renderer dostaje własną listę, bo przy obserwowaniu sceny zmienia się ona dopiero między klatkami
+    renderer = Renderer(screen, camera, list(prisms))
+    if OPTIMIZE_FACES:
+        faces = SceneFaces(prisms)
+        renderer.faces = faces
+    else:
+        faces = Prism.extract_faces([(prism.transformed_vertices(), prism.color) for prism in prisms])
+    if MESH_SCENE_PATH:
+        renderer.meshes = Mesh.load_meshes_from_file(MESH_SCENE_PATH)
+    if BSP_MODE:
+        renderer.bsp = load_or_build_bsp(SCENE_PATH, faces)
+    spatial_index = SpatialIndex.from_prisms(prisms)
+    if DYNAMIC_RESOLUTION:
+        renderer.scaler = ResolutionScaler(FRAME_BUDGET, *RESOLUTION_SCALE_LIMITS, smoothing=RESOLUTION_SMOOTHING)
 
     renderer.render()
 
@@ -22,12 +59,12 @@ def main():
         pygame.K_DOWN: lambda: camera.rotate(0, +ROT_SPEED['x']),
         pygame.K_z: lambda: camera.rotate(2, ROT_SPEED['z']),
         pygame.K_c: lambda: camera.rotate(2, -ROT_SPEED['z']),
-        pygame.K_w: lambda: shift_prisms(prisms, camera.translate(0, 0, MOVE_SPEED)),
-        pygame.K_s: lambda: shift_prisms(prisms, camera.translate(0, 0, -MOVE_SPEED)),
-        pygame.K_a: lambda: shift_prisms(prisms, camera.translate(MOVE_SPEED, 0, 0)),
-        pygame.K_d: lambda: shift_prisms(prisms, camera.translate(-MOVE_SPEED, 0, 0)),
-        pygame.K_q: lambda: shift_prisms(prisms, camera.translate(0, MOVE_SPEED, 0)),
-        pygame.K_e: lambda: shift_prisms(prisms, camera.translate(0, -MOVE_SPEED, 0)),
+        pygame.K_w: lambda: camera.move(0, 0, MOVE_SPEED),
+        pygame.K_s: lambda: camera.move(0, 0, -MOVE_SPEED),
+        pygame.K_a: lambda: camera.move(MOVE_SPEED, 0, 0),
+        pygame.K_d: lambda: camera.move(-MOVE_SPEED, 0, 0),
+        pygame.K_q: lambda: camera.move(0, MOVE_SPEED, 0),
+        pygame.K_e: lambda: camera.move(0, -MOVE_SPEED, 0),
         pygame.K_EQUALS: lambda: camera.zoom(-ZOOM_STEP),
         pygame.K_MINUS: lambda: camera.zoom(ZOOM_STEP),
     }
@@ -40,44 +77,124 @@ def main():
         } for key in key_map
     }
 
-    running = True
-    while running:
-        dt = clock.tick(60)
-        current_time = pygame.time.get_ticks()
+    initial = camera.snapshot()
+    snapshots = {"previous": initial, "current": initial, "submitted": initial}
+
+    recorder = InputRecorder(args.record, UPDATE_STEP) if args.record else None
+    replay = InputReplay(args.replay) if args.replay else None
+    use_render_thread = RENDER_THREAD and replay is None
+    reloader = None
+    if WATCH_SCENE and replay is None:
+        reloader = SceneReloader(SceneWatcher(SCENE_PATH), prisms, spatial_index, renderer.faces, renderer.bsp is not None)
+        reloader.start()
+    scene_lock = reloader.lock if reloader is not None else nullcontext()
+    timings = []
+
+    def pick(x, y):
+        origin, direction = camera.screen_ray(x, y)
+        with scene_lock:
+            index, distance = spatial_index.ray_cast(origin, direction)
+            prism = prisms[index[0]] if index[0] >= 0 else None
+        if prism is None:
+            print("Nic nie trafiono")
+            return
+        print(f"Prostopadłościan {index[0]}: pozycja {prism.position.tolist()}, kolor {tuple(prism.color)}, odległość {distance[0]:.2f}")
 
+    def poll_input(step_index):
+        if replay is not None:
+            events = replay.poll(step_index)
+            if step_index >= replay.last_step:
+                events = events + [(EVENT_QUIT, 0)]
+            return events, replay.is_pressed
+
+        events = []
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                running = False
+                events.append((EVENT_QUIT, 0))
             elif event.type == pygame.KEYDOWN:
-                if event.key in key_map and not key_states[event.key]["pressed"]:
-                    key_map[event.key]()
-                    key_states[event.key]["pressed"] = True
-                    key_states[event.key]["start_time"] = current_time
-                    key_states[event.key]["last_repeat"] = current_time
-                    renderer.render()
+                events.append((EVENT_KEYDOWN, event.key))
             elif event.type == pygame.KEYUP:
-                if event.key in key_states:
-                    key_states[event.key]["pressed"] = False
+                events.append((EVENT_KEYUP, event.key))
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                pick(*event.pos)
+        if recorder is not None:
+            for kind, key in events:
+                recorder.record(step_index, kind, key)
 
         keys = pygame.key.get_pressed()
+        return events, lambda key: keys[key]
+
+    def update(sim_time, step):
+        current_time = int(sim_time * 1000)
         any_action = False
+        events, is_pressed = poll_input(scheduler.steps)
+
+        for kind, key in events:
+            if kind == EVENT_QUIT:
+                scheduler.stop()
+            elif kind == EVENT_KEYDOWN:
+                if key in key_map and not key_states[key]["pressed"]:
+                    key_map[key]()
+                    key_states[key]["pressed"] = True
+                    key_states[key]["start_time"] = current_time
+                    key_states[key]["last_repeat"] = current_time
+                    any_action = True
+            elif kind == EVENT_KEYUP:
+                if key in key_states:
+                    key_states[key]["pressed"] = False
 
         for key, state in key_states.items():
-            if state["pressed"] and keys[key]:
+            if state["pressed"] and is_pressed(key):
                 if current_time - state["start_time"] > HOLD_START_DELAY:
                     if current_time - state["last_repeat"] > HOLD_REPEAT_INTERVAL:
                         key_map[key]()
                         state["last_repeat"] = current_time
                         any_action = True
 
+        updates = reloader.poll() if reloader is not None else []
+        if updates:
+            # Zmiany wprowadzi renderer przed następną klatką, którą wymuszamy także przy nieruchomej kamerze
+            renderer.pending_updates.extend(updates)
+            snapshots["submitted"] = None
+
+        snapshots["previous"] = snapshots["current"]
         if any_action:
-            renderer.render()
+            snapshots["current"] = camera.snapshot()
 
-    pygame.quit()
+    def render(alpha):
+        previous, current = snapshots["previous"], snapshots["current"]
+        if previous is not current or snapshots["submitted"] is not current:
+            snapshot = CameraSnapshot.interpolate(previous, current, alpha)
+            if use_render_thread:
+                render_thread.submit(snapshot)
+            else:
+                start = time.perf_counter()
+                renderer.render(snapshot)
+                timings.append((scheduler.steps, time.perf_counter() - start))
+            snapshots["submitted"] = snapshot
+
+        frame = render_thread.poll() if use_render_thread else None
+        if frame is not None:
+            renderer.present(frame)
 
-def shift_prisms(prisms, vec):
-    for prism in prisms:
-        prism.position += vec
+    scheduler = LoopScheduler(update, render, step=UPDATE_STEP, max_fps=MAX_FPS)
+    render_thread = RenderThread(renderer.render_frame)
+    if use_render_thread:
+        render_thread.start()
+
+    if replay is not None:
+        scheduler.run_virtual()
+        report_timings(timings, args.timings)
+    else:
+        scheduler.run()
+
+    if use_render_thread:
+        render_thread.stop()
+    if reloader is not None:
+        reloader.stop()
+    if recorder is not None:
+        recorder.close()
+    pygame.quit()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,74 @@
+import json
+import os
+import numpy as np
+
+def create_sphere(radius=1.0, sectors=40, stacks=40):
+    # Ta sama siatka kątów co w ligth/sphere.py, ale z indeksami zamiast powielonych wierzchołków
+    theta = np.pi * np.arange(stacks + 1) / stacks
+    phi = 2 * np.pi * np.arange(sectors + 1) / sectors
+    theta, phi = np.meshgrid(theta, phi, indexing="ij")
+    vertices = radius * np.stack((np.sin(theta) * np.cos(phi),
+                                  np.cos(theta),
+                                  np.sin(theta) * np.sin(phi)), axis=-1).reshape(-1, 3)
+
+    i, j = np.meshgrid(np.arange(stacks), np.arange(sectors), indexing="ij")
+    p1 = (i * (sectors + 1) + j).ravel()
+    p2 = p1 + 1
+    p3 = p1 + sectors + 1
+    p4 = p3 + 1
+    triangles = np.concatenate((np.column_stack((p1, p4, p3)), np.column_stack((p1, p2, p4))))
+
+    # Na biegunach jeden z trójkątów każdego czworokąta jest zdegenerowany
+    a, b, c = vertices[triangles[:, 0]], vertices[triangles[:, 1]], vertices[triangles[:, 2]]
+    area = np.linalg.norm(np.cross(b - a, c - a), axis=1)
+    return vertices, triangles[area > 1e-12 * radius * radius]
+
+def load_obj(path):
+    vertices = []
+    triangles = []
+    with open(path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == "v":
+                vertices.append([float(x) for x in parts[1:4]])
+            elif parts[0] == "f":
+                # Tylko indeks pozycji z "v/vt/vn", ujemne indeksy liczone od końca
+                face = [int(p.split("/")[0]) for p in parts[1:]]
+                face = [k - 1 if k > 0 else len(vertices) + k for k in face]
+                # Wielokąty dzielimy na wachlarz trójkątów
+                for k in range(1, len(face) - 1):
+                    triangles.append([face[0], face[k], face[k + 1]])
+    return np.array(vertices, dtype=np.float64).reshape(-1, 3), np.array(triangles, dtype=np.int64).reshape(-1, 3)
+
+class Mesh:
+    def __init__(self, vertices, triangles, position=(0, 0, 0), color=(255, 255, 255)):
+        self.vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 3)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        self.position = np.array(position, dtype=np.float64)
+        self.color = color
+
+    @staticmethod
+    def load_meshes_from_file(path):
+        with open(path, 'r') as f:
+            data = json.load(f)
+
+        meshes = []
+        for item in data:
+            if "obj" in item:
+                # Ścieżka do pliku OBJ względem pliku sceny
+                vertices, triangles = load_obj(os.path.join(os.path.dirname(path), item["obj"]))
+                vertices = vertices * item.get("scale", 1.0)
+            else:
+                sphere = item.get("sphere", {})
+                vertices, triangles = create_sphere(sphere.get("radius", 1.0), sphere.get("sectors", 40), sphere.get("stacks", 40))
+            position = item.get("position", [0, 0, 0])
+            color = item.get("color", (255, 255, 255))
+            meshes.append(Mesh(vertices, triangles, position, color))
+        return meshes
+
+    def transformed_vertices(self):
+        transformed = np.ones((len(self.vertices), 4))
+        transformed[:, :3] = self.vertices + self.position
+        return transformed
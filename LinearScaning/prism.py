@@ -2,6 +2,15 @@ import numpy as np
 import json
 from constants import SCREEN_WIDTH, SCREEN_HEIGHT
 
+FACE_INDICES = [
+    (0, 3, 2, 1),
+    (4, 5, 6, 7),
+    (0, 1, 5, 4),
+    (2, 3, 7, 6),
+    (0, 4, 7, 3),
+    (1, 2, 6, 5),
+]
+
 class Prism:
     def __init__(self, size, position, color = (255, 255, 255)):
         self.vertices = self.create_rectangular_prism(*size)
@@ -21,13 +30,14 @@ class Prism:
         with open(path, 'r') as f:
             data = json.load(f)
 
-        prisms = []
-        for item in data:
-            size = item.get("size", [1, 1, 1])
-            position = item.get("position", [0, 0, 0])
-            color = item.get("color", (255, 255, 255))
-            prisms.append(Prism(size, position, color))
-        return prisms
+        return [Prism.from_dict(item) for item in data]
+
+    @staticmethod
+    def from_dict(item):
+        size = item.get("size", [1, 1, 1])
+        position = item.get("position", [0, 0, 0])
+        color = item.get("color", (255, 255, 255))
+        return Prism(size, position, color)
     
     @staticmethod
     def create_rectangular_prism(width=1, depth=1, height=1):
@@ -44,18 +54,10 @@ class Prism:
     
     @staticmethod
     def extract_faces(shapes):
-        face_indices = [
-            (0, 3, 2, 1),
-            (4, 5, 6, 7),
-            (0, 1, 5, 4),
-            (2, 3, 7, 6),
-            (0, 4, 7, 3),
-            (1, 2, 6, 5), 
-        ]
         polygons = []
         for pts, color in shapes: 
             
-            for face in face_indices:
+            for face in FACE_INDICES:
                 polygon = {
                     "points": [pts[i] for i in face],
                     "color": color
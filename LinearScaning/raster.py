@@ -0,0 +1,110 @@
+import numpy as np
+
+MAX_TILE = 32
+MAX_SAMPLES = 1 << 20
+
+def edge_coefficients(pts):
+    # Funkcje krawędzi w postaci a*x + b*y + c, podzielone przez pole, żeby dawały współrzędne barycentryczne
+    x, y = pts[..., 0], pts[..., 1]
+    x1, y1 = np.roll(x, -1, axis=1), np.roll(y, -1, axis=1)
+    x2, y2 = np.roll(x, -2, axis=1), np.roll(y, -2, axis=1)
+    a = y1 - y2
+    b = x2 - x1
+    c = x1 * y2 - x2 * y1
+    area = c.sum(axis=1)
+    valid = np.abs(area) > 1e-9
+    area = np.where(valid, area, 1.0)[:, None]
+    return a / area, b / area, c / area, valid
+
+def tile_size(span, max_tile):
+    return np.minimum(1 << np.ceil(np.log2(span)).astype(np.int64), max_tile)
+
+def triangle_tiles(x0, y0, x1, y1, max_tile=MAX_TILE):
+    # Kafelek o bokach będących potęgami dwójki obejmuje prostokąt trójkąta, duże trójkąty dzielimy na kilka kafelków
+    width = tile_size(x1 - x0 + 1, max_tile)
+    height = tile_size(y1 - y0 + 1, max_tile)
+    nx = -(-(x1 - x0 + 1) // width)
+    ny = -(-(y1 - y0 + 1) // height)
+    count = nx * ny
+
+    tri = np.repeat(np.arange(len(x0)), count)
+    local = np.arange(len(tri)) - np.repeat(np.cumsum(count) - count, count)
+    ox = x0[tri] + local % nx[tri] * width[tri]
+    oy = y0[tri] + local // nx[tri] * height[tri]
+    return tri, ox, oy, width[tri], height[tri]
+
+def rasterize_triangles(zbuffer, img_buffer, pts, depth, colors, max_tile=MAX_TILE, max_samples=MAX_SAMPLES):
+    height, width = zbuffer.shape
+    a, b, c, valid = edge_coefficients(pts)
+
+    x, y = pts[..., 0], pts[..., 1]
+    min_x = np.minimum(np.minimum(x[:, 0], x[:, 1]), x[:, 2])
+    max_x = np.maximum(np.maximum(x[:, 0], x[:, 1]), x[:, 2])
+    min_y = np.minimum(np.minimum(y[:, 0], y[:, 1]), y[:, 2])
+    max_y = np.maximum(np.maximum(y[:, 0], y[:, 1]), y[:, 2])
+    x0 = np.clip(np.floor(min_x), 0, width - 1).astype(np.int64)
+    x1 = np.clip(np.ceil(max_x), 0, width - 1).astype(np.int64)
+    y0 = np.clip(np.floor(min_y), 0, height - 1).astype(np.int64)
+    y1 = np.clip(np.ceil(max_y), 0, height - 1).astype(np.int64)
+    on_screen = valid & (max_x >= 0) & (min_x < width) & (max_y >= 0) & (min_y < height)
+    visible = np.flatnonzero(on_screen)
+    if len(visible) == 0:
+        return 0
+
+    # Głębokość jest liniowa w przestrzeni ekranu: z = dzdx * x + dzdy * y + z0
+    plane = np.column_stack(((a * depth).sum(axis=1), (b * depth).sum(axis=1), (c * depth).sum(axis=1)))
+
+    tri, ox, oy, tile_w, tile_h = triangle_tiles(x0[visible], y0[visible], x1[visible], y1[visible], max_tile)
+    tri = visible[tri]
+
+    zflat = zbuffer.reshape(-1)
+    imgflat = img_buffer.reshape(height * width, -1) if img_buffer.ndim == 3 else img_buffer.reshape(-1)
+    written = 0
+    # Kafelki tego samego rozmiaru liczymy razem, w porcjach ograniczających pamięć
+    shape = tile_w * (max_tile + 1) + tile_h
+    for key in np.unique(shape):
+        w, h = divmod(int(key), max_tile + 1)
+        group = np.flatnonzero(shape == key)
+        batch = max(max_samples // (w * h), 1)
+        for start in range(0, len(group), batch):
+            k = group[start:start + batch]
+            written += rasterize_tiles(zflat, imgflat, width, tri[k], ox[k], oy[k], w, h,
+                                       a, b, c, plane, colors, x1, y1)
+    return written
+
+def rasterize_tiles(zflat, imgflat, width, tri, ox, oy, tile_w, tile_h, a, b, c, plane, colors, x1, y1):
+    cols = np.arange(tile_w, dtype=np.float32)
+    rows = np.arange(tile_h, dtype=np.float32)
+    # Środek pierwszego piksela kafelka, dalej funkcje krawędzi rosną liniowo wzdłuż wierszy i kolumn
+    sx, sy = ox + 0.5, oy + 0.5
+    inside = ((cols[None, None, :] <= (x1[tri] - ox)[:, None, None]) &
+              (rows[None, :, None] <= (y1[tri] - oy)[:, None, None]))
+    for i in range(3):
+        ai, bi = a[tri, i], b[tri, i]
+        base = (ai * sx + bi * sy + c[tri, i]).astype(np.float32)
+        row = base[:, None] + bi.astype(np.float32)[:, None] * rows[None, :]
+        inside &= (row[:, :, None] + (ai.astype(np.float32)[:, None] * cols[None, :])[:, None, :]) >= 0
+
+    t, ty, tx = np.nonzero(inside)
+    if len(t) == 0:
+        return 0
+    x, y, tri = ox[t] + tx, oy[t] + ty, tri[t]
+    index = y * width + x
+    z = plane[tri, 0] * (x + 0.5) + plane[tri, 1] * (y + 0.5) + plane[tri, 2]
+
+    closer = z < zflat[index]
+    index, z, tri = index[closer], z[closer], tri[closer]
+
+    # Piksel trafiony kilka razy w tej porcji: zostaje tylko najbliższa próbka
+    counts = np.bincount(index, minlength=len(zflat))
+    shared = counts[index] > 1
+    if shared.any():
+        order = np.flatnonzero(shared)[np.lexsort((z[shared], index[shared]))]
+        first = np.concatenate(([True], index[order[1:]] != index[order[:-1]]))
+        keep = ~shared
+        keep[order[first]] = True
+        index, z, tri = index[keep], z[keep], tri[keep]
+
+    zflat[index] = z
+    imgflat[index] = colors[tri]
+    return len(index)
@@ -1,23 +1,58 @@
+import time
 import pygame
 import numpy as np
 from constants import SCREEN_WIDTH, SCREEN_HEIGHT
-from collections import defaultdict
+from collections import defaultdict, deque
+from hiz import DepthPyramid
+from raster import rasterize_triangles
+
+DEPTH_MAX = np.iinfo(np.uint16).max
+# Najmniejsze w, przy którym wierzchołek jest rzutowany; bliżej kamery ściany są przycinane
+MIN_W = 0.2
+
+def clip_near(verts, depth):
+    # Sutherland–Hodgman względem płaszczyzny z = -depth w układzie kamery
+    inside = verts[:, 2] <= -depth
+    if inside.all():
+        return verts
+    clipped = []
+    for i in range(len(verts)):
+        a, b = verts[i], verts[(i + 1) % len(verts)]
+        if inside[i]:
+            clipped.append(a)
+        if inside[i] != inside[(i + 1) % len(verts)]:
+            t = (-depth - a[2]) / (b[2] - a[2])
+            clipped.append(a + t * (b - a))
+    return np.array(clipped).reshape(-1, verts.shape[1])
 
 class Renderer:
-    def __init__(self, screen, camera, prisms):
+    def __init__(self, screen, camera, prisms, size=(SCREEN_WIDTH, SCREEN_HEIGHT)):
         self.screen = screen
         self.camera = camera
         self.prisms = prisms
-
-    def rotate_to_camera(self, vertices):
-        rotated = self.camera.rotation.apply(vertices[:, :3])
+        self.full_size = size
+        self.width, self.height = size
+        self.scaler = None
+        self.compact_buffers = False
+        self.occlusion_culling = True
+        self.bsp = None
+        self.faces = None
+        self.meshes = []
+        self.stats = {}
+        # Zmiany sceny przygotowane w tle, wprowadzane przed rysowaniem kolejnej klatki
+        self.pending_updates = deque()
+
+    def rotate_to_camera(self, vertices, camera=None):
+        camera = self.camera if camera is None else camera
+        rotated = camera.rotation.apply(vertices[:, :3] - camera.position)
         rotated = np.hstack((rotated, vertices[:, 3:]))
 
         return rotated
 
 
-    def apply_transformations(self, vertices):
-            projection = self.camera.get_projection_matrix()
+    def apply_transformations(self, vertices, camera=None):
+            camera = self.camera if camera is None else camera
+            projection = camera.get_projection_matrix()
             projected = vertices @ projection.T
 
             w = projected[:, 3]
@@ -25,7 +60,7 @@ class Renderer:
 
                 return None
             
-            valid_mask = np.abs(w) > (0.2)
+            valid_mask = np.abs(w) > MIN_W
             w_clamped = np.clip(w, 0.1, None)
             screen_vertices = np.full_like(projected[:, :2], np.nan)
             screen_vertices[valid_mask] = projected[valid_mask, :2] / w_clamped[valid_mask, None]
@@ -87,7 +122,7 @@ class Renderer:
             return
 
         min_y = max(int(min(p[1] for p in points)), 0)
-        max_y = min(int(max(p[1] for p in points)), SCREEN_HEIGHT - 1)
+        max_y = min(int(max(p[1] for p in points)), self.height - 1)
 
         for y in range(min_y, max_y + 1):
             xz_intersections = []
@@ -102,11 +137,11 @@ class Renderer:
                     x_start = int(min(x0, x1))
                     x_end = int(max(x0, x1))
 
-                    if x_end < 0 or x_start >= SCREEN_WIDTH:
+                    if x_end < 0 or x_start >= self.width:
                         continue 
 
                     x_start = max(x_start, 0)
-                    x_end = min(x_end, SCREEN_WIDTH - 1)
+                    x_end = min(x_end, self.width - 1)
 
                     if x1 != x0:
                         dz = (z1 - z0) / (x1 - x0 + 1e-6)
@@ -114,12 +149,7 @@ class Renderer:
                         dz = 0
 
                     z = z0 + (x_start - x0) * dz
-
-                    for x in range(x_start, x_end + 1):
-                        if z < z_row[x]:
-                            z_row[x] = z
-                            img_row[x] = color
-                        z += dz
+                    self.fill_span(z_row, img_row, x_start, x_end, z, dz, color)
                     continue
 
                 if y < min(y0, y1) or y >= max(y0, y1):
@@ -139,7 +169,7 @@ class Renderer:
                     x1, z1 = xz_intersections[i + 1]
 
                     ix0 = max(int(x0), 0)
-                    ix1 = min(int(x1), SCREEN_WIDTH - 1)
+                    ix1 = min(int(x1), self.width - 1)
 
                     if x1 != x0:
                         dz = (z1 - z0) / (x1 - x0 + 1e-6)
@@ -147,53 +177,287 @@ class Renderer:
                         dz = 0
 
                     z = z0 + (ix0 - x0) * dz
+                    self.fill_span(z_row, img_row, ix0, ix1, z, dz, color)
 
-                    for x in range(ix0, ix1 + 1):
-                        if z < z_row[x]:
-                            z_row[x] = z
-                            img_row[x] = color
-                        z += dz
+    def fill_span(self, z_row, img_row, x_start, x_end, z, dz, color):
+        if x_end < x_start:
+            return
 
-    def scanline_render(self, polygons):
-        zbuffer = np.full((SCREEN_HEIGHT, SCREEN_WIDTH), np.inf, dtype=np.float32)
-        img_buffer = np.zeros((SCREEN_HEIGHT, SCREEN_WIDTH, 3), dtype=np.uint8)
+        # Tryb BSP: zamiast z-bufora maska pokrycia, każdy piksel zapisywany raz
+        if z_row.dtype == bool:
+            free = ~z_row[x_start:x_end + 1]
+            img_row[x_start:x_end + 1][free] = color
+            z_row[x_start:x_end + 1] = True
+            return
 
-        for poly in sorted(polygons, key=lambda poly: max(p[1] for p in poly["points"])):
-            self.scanline_polygon_fill(img_buffer, poly, zbuffer)
+        # Cały odcinek leży za tym, co już narysowano
+        z_end = z + (x_end - x_start) * dz
+        if min(z, z_end) >= z_row[x_start:x_end + 1].max():
+            return
 
-        pygame.surfarray.blit_array(self.screen, np.transpose(img_buffer, (1, 0, 2)))
+        for x in range(x_start, x_end + 1):
+            if z < z_row[x]:
+                z_row[x] = z
+                img_row[x] = color
+            z += dz
+
+    def polygon_order(self, polygons):
+        if not polygons:
+            return np.empty(0, dtype=np.intp)
+
+        counts = np.array([len(poly["points"]) for poly in polygons])
+        starts = np.cumsum(counts) - counts
+        points = np.concatenate([poly["points"] for poly in polygons])
+
+        min_depth = np.minimum.reduceat(points[:, 2], starts)
+        min_y = np.minimum.reduceat(points[:, 1], starts)
+        max_y = np.maximum.reduceat(points[:, 1], starts)
+
+        # Od przodu do tyłu, żeby test głębokości odrzucał zasłonięte odcinki
+        order = np.lexsort((min_y, min_depth))
+        on_screen = (max_y[order] >= 0) & (min_y[order] < self.height)
+        return order[on_screen]
+
+    def scanline_render(self, polygons, buffers=None):
+        zbuffer, img_buffer = buffers or self.new_buffers()
+
+        for i in self.polygon_order(polygons):
+            self.scanline_polygon_fill(img_buffer, polygons[i], zbuffer)
+
+        return img_buffer
+
+    def new_buffers(self):
+        if self.compact_buffers:
+            # Głębokość skwantowana do uint16 w zakresie głębokości klatki, piksele spakowane w uint32
+            zbuffer = np.full((self.height, self.width), DEPTH_MAX, dtype=np.uint16)
+            img_buffer = np.full((self.height, self.width), self.pack_color((0, 0, 0)), dtype=np.uint32)
+        else:
+            zbuffer = np.full((self.height, self.width), np.inf, dtype=np.float32)
+            img_buffer = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        return zbuffer, img_buffer
+
+    def pack_color(self, color):
+        if self.screen is not None and self.screen.get_bitsize() == 32:
+            return self.screen.map_rgb(color)
+        r, g, b = (int(c) for c in color[:3])
+        return (r << 16) | (g << 8) | b
+
+    def pack_colors(self, colors):
+        colors = colors.astype(np.uint32)
+        if self.screen is not None and self.screen.get_bitsize() == 32:
+            shifts, masks = self.screen.get_shifts(), self.screen.get_masks()
+            return (colors[:, 0] << shifts[0]) | (colors[:, 1] << shifts[1]) | (colors[:, 2] << shifts[2]) | np.uint32(masks[3])
+        return (colors[:, 0] << 16) | (colors[:, 1] << 8) | colors[:, 2]
+
+    def quantize_depth(self, z, lo, hi):
+        return np.clip((z - lo) / max(hi - lo, 1e-9), 0, 1) * (DEPTH_MAX - 1)
+
+    def quantize_frame_depth(self, meshes, prism_polygons):
+        # Zakres uint16 rozciągamy na głębokości widoczne w tej klatce, więc nic nie nasyca się na far
+        depths = [depth.ravel() for _, depth, _ in meshes]
+        depths += [poly["points"][:, 2] for polygons in prism_polygons for poly in polygons]
+        if not depths:
+            return
+        depths = np.concatenate(depths)
+        lo, hi = depths.min(), depths.max()
+        for k, (pts, depth, colors) in enumerate(meshes):
+            meshes[k] = pts, self.quantize_depth(depth, lo, hi), colors
+        for polygons in prism_polygons:
+            for poly in polygons:
+                poly["points"][:, 2] = self.quantize_depth(poly["points"][:, 2], lo, hi)
+
+    def present(self, img_buffer):
+        pixels = img_buffer.T if img_buffer.ndim == 2 else np.transpose(img_buffer, (1, 0, 2))
+        if pixels.shape[:2] == self.screen.get_size():
+            pygame.surfarray.blit_array(self.screen, pixels)
+        else:
+            # Obraz w mniejszej rozdzielczości rozciągamy na całe okno
+            surface = pygame.Surface(pixels.shape[:2], 0, self.screen)
+            pygame.surfarray.blit_array(surface, pixels)
+            pygame.transform.scale(surface, self.screen.get_size(), self.screen)
         pygame.display.flip()
 
-    
-    def render(self):
+    def render(self, camera=None):
+        self.present(self.render_frame(camera))
+
+    def render_frame(self, camera=None):
+        if self.scaler is not None:
+            self.width, self.height = self.scaler.size(*self.full_size)
+
+        while self.pending_updates:
+            self.pending_updates.popleft().apply(self)
+
+        start = time.perf_counter()
+        img_buffer = self.draw_frame(camera)
+        frame_time = time.perf_counter() - start
+
+        if self.scaler is not None:
+            self.scaler.observe(frame_time)
+        self.stats["frame_ms"] = frame_time * 1000
+        self.stats["resolution"] = (self.width, self.height)
+        return img_buffer
+
+    def draw_frame(self, camera=None):
+        self.stats = {"prisms_drawn": 0, "prisms_culled": 0, "faces_drawn": 0, "faces_culled": 0,
+                      "pixels_culled": 0, "triangles_drawn": 0}
+        # Kolejność BSP nie uwzględnia siatek, więc z siatkami zostaje z-bufor
+        if self.bsp is not None and not self.meshes:
+            return self.bsp_render(camera)
+        buffers = self.new_buffers()
+        meshes = [triangles for triangles in (self.mesh_triangles(mesh, camera) for mesh in self.meshes) if triangles is not None]
+        if self.faces is not None:
+            projected = (self.project_face(face["points"], face["color"], camera) for face in self.faces)
+            prism_polygons = [[polygon] for polygon in projected if polygon is not None]
+        else:
+            prism_polygons = [self.prism_polygons(prism, camera) for prism in self.prisms]
+        if self.compact_buffers:
+            self.quantize_frame_depth(meshes, prism_polygons)
+
+        for pts, depth, colors in meshes:
+            self.stats["triangles_drawn"] += len(pts)
+            rasterize_triangles(buffers[0], buffers[1], pts, depth, colors)
+        if not self.occlusion_culling:
+            return self.scanline_render([poly for polygons in prism_polygons for poly in polygons], buffers)
+        # Połączone ściany nie należą do jednego prostopadłościanu, więc liczymy je osobno
+        unit = "faces" if self.faces is not None else "prisms"
+        return self.occlusion_render([polygons for polygons in prism_polygons if polygons], buffers, unit)
+
+    def mesh_triangles(self, mesh, camera=None):
+        # Trójkąty gotowe do rasteryzacji: punkty ekranu, głębokość i kolory po cieniowaniu
+        camera = self.camera if camera is None else camera
+        verts = self.rotate_to_camera(mesh.transformed_vertices(), camera)
+
+        # Jak w project_face: odrzucamy tylne ściany, a trójkąty przecinające płaszczyznę bliską przycinamy
+        tris = mesh.triangles
+        v0, v1, v2 = verts[tris[:, 0], :3], verts[tris[:, 1], :3], verts[tris[:, 2], :3]
+        normal = np.cross(v1 - v0, v2 - v0)
+        facing = np.einsum("ij,ij->i", normal, v0)
+        depth_limit = self.near_clip_depth(camera)
+        inside = (verts[:, 2] <= -depth_limit)[tris].sum(axis=1)
+        whole = np.flatnonzero((facing < 0) & (inside == 3))
+        crossing = np.flatnonzero((facing < 0) & (inside > 0) & (inside < 3))
+
+        # Przycięty wielokąt dzielimy na wachlarz trójkątów z nowymi wierzchołkami na końcu tablicy
+        clipped, fans, parents = [], [], []
+        next_vertex = len(verts)
+        for k in crossing.tolist():
+            polygon = clip_near(verts[tris[k]], depth_limit)
+            for j in range(1, len(polygon) - 1):
+                fans.append((next_vertex, next_vertex + j, next_vertex + j + 1))
+                parents.append(k)
+            clipped.append(polygon)
+            next_vertex += len(polygon)
+        if clipped:
+            verts = np.vstack([verts] + clipped)
+        parent = np.concatenate((whole, np.array(parents, dtype=np.int64)))
+        tris = np.concatenate((tris[whole], np.array(fans, dtype=np.int64).reshape(-1, 3)))
+        if len(tris) == 0:
+            return None
+        normal, facing, v0 = normal[parent], facing[parent], v0[parent]
+        screen_verts = self.apply_transformations(verts, camera)
+
+        pts = np.empty(screen_verts.shape)
+        pts[:, 0] = (screen_verts[:, 0] + 1) * 0.5 * self.width
+        pts[:, 1] = (1 - (screen_verts[:, 1] + 1) * 0.5) * self.height
+        depth = np.abs(verts[:, 2])
+
+        # Cieniowanie płaskie światłem z kamery, żeby krzywizna siatki była widoczna
+        cos = -facing / np.maximum(np.linalg.norm(normal, axis=1) * np.linalg.norm(v0, axis=1), 1e-12)
+        shade = 0.3 + 0.7 * np.clip(cos, 0, 1)
+        colors = np.clip(np.asarray(mesh.color[:3], dtype=np.float64) * shade[:, None], 0, 255).astype(np.uint8)
+        colors = self.pack_colors(colors) if self.compact_buffers else colors
+        return pts[tris], depth[tris], colors
+
+    def occlusion_render(self, prism_polygons, buffers=None, unit="prisms"):
+        zbuffer, img_buffer = buffers or self.new_buffers()
+        if not prism_polygons:
+            return img_buffer
+
+        pyramid = DepthPyramid(zbuffer)
+        points = [np.concatenate([poly["points"] for poly in polygons]) for polygons in prism_polygons]
+        counts = np.array([len(pts) for pts in points])
+        starts = np.cumsum(counts) - counts
+        points = np.concatenate(points)
+
+        min_depth = np.minimum.reduceat(points[:, 2], starts)
+        x0 = np.clip(np.minimum.reduceat(points[:, 0], starts), 0, self.width - 1).astype(int)
+        x1 = np.clip(np.maximum.reduceat(points[:, 0], starts), 0, self.width - 1).astype(int)
+        y0 = np.clip(np.minimum.reduceat(points[:, 1], starts), 0, self.height - 1).astype(int)
+        y1 = np.clip(np.maximum.reduceat(points[:, 1], starts), 0, self.height - 1).astype(int)
+
+        for i in np.argsort(min_depth, kind="stable"):
+            if pyramid.is_occluded(x0[i], y0[i], x1[i], y1[i], min_depth[i]):
+                self.stats[unit + "_culled"] += 1
+                self.stats["pixels_culled"] += int((x1[i] - x0[i] + 1) * (y1[i] - y0[i] + 1))
+                continue
+
+            for poly in prism_polygons[i]:
+                self.scanline_polygon_fill(img_buffer, poly, zbuffer)
+            pyramid.update(x0[i], y0[i], x1[i], y1[i])
+            self.stats[unit + "_drawn"] += 1
+
+        return img_buffer
+
+    def bsp_render(self, camera=None):
+        camera = self.camera if camera is None else camera
+        coverage = np.zeros((self.height, self.width), dtype=bool)
+        _, img_buffer = self.new_buffers()
+
+        for i in self.bsp.traverse(camera.position, front_to_back=True):
+            points = self.bsp.polygon(i)
+            verts = np.hstack((points, np.ones((len(points), 1))))
+            polygon = self.project_face(verts, self.bsp.colors[i], camera)
+            if polygon is not None:
+                self.scanline_polygon_fill(img_buffer, polygon, coverage)
+
+        return img_buffer
+
+    def prism_polygons(self, prism, camera=None):
         polygons = []
-        for prism in self.prisms:
-            transformed = prism.transformed_vertices()
-            faces = prism.extract_faces([(transformed, prism.color)])
-
-            for face in faces:
-                verts = np.array(face["points"])
-                if len(verts) < 3:
-                    continue
-                verts = self.rotate_to_camera(verts)
-                z = abs(verts[:,2])
-                normal = np.cross(verts[1][:3] - verts[0][:3], verts[2][:3] - verts[0][:3])
-                if np.dot(normal, verts[0][:3]) > 0:
-                    continue
-                            
-                screen_verts = self.apply_transformations(verts)
-                if screen_verts is None or np.isnan(screen_verts).all():
-                    continue
-
-                valid_mask = ~np.isnan(screen_verts).any(axis=1)
-                screen_pts = [(int((v[0] + 1) * 0.5 * SCREEN_WIDTH),
-                            int((1 - (v[1] + 1) * 0.5) * SCREEN_HEIGHT))
-                            for v in screen_verts[valid_mask]]
-                z = z[valid_mask]
-                if len(screen_pts) == len(z) and len(z) >= 3:
-                    pts = np.column_stack((screen_pts, z))
-                    polygons.append({
-                        "points": pts,
-                        "color": face["color"]
-                    })
-        self.scanline_render(polygons)
\ No newline at end of file
+        transformed = prism.transformed_vertices()
+        faces = prism.extract_faces([(transformed, prism.color)])
+
+        for face in faces:
+            polygon = self.project_face(np.array(face["points"]), face["color"], camera)
+            if polygon is not None:
+                polygons.append(polygon)
+        return polygons
+
+    def near_clip_depth(self, camera=None):
+        # Głębokość, na której w osiąga MIN_W; bliższe wierzchołki nie są rzutowane
+        projection = (self.camera if camera is None else camera).get_projection_matrix()
+        return MIN_W / -projection[3, 2] * (1 + 1e-6)
+
+    def project_face(self, verts, color, camera=None):
+        if len(verts) < 3:
+            return None
+        verts = self.rotate_to_camera(verts, camera)
+        normal = np.cross(verts[1][:3] - verts[0][:3], verts[2][:3] - verts[0][:3])
+        if np.dot(normal, verts[0][:3]) > 0:
+            return None
+
+        # Bez przycięcia wierzchołki za kamerą dają dowolne punkty na ekranie, co przy dużych
+        # połączonych ścianach zalewa cały obraz
+        verts = clip_near(verts, self.near_clip_depth(camera))
+        if len(verts) < 3:
+            return None
+        z = abs(verts[:,2])
+
+        screen_verts = self.apply_transformations(verts, camera)
+        if screen_verts is None or np.isnan(screen_verts).all():
+            return None
+
+        valid_mask = ~np.isnan(screen_verts).any(axis=1)
+        screen_pts = [(int((v[0] + 1) * 0.5 * self.width),
+                    int((1 - (v[1] + 1) * 0.5) * self.height))
+                    for v in screen_verts[valid_mask]]
+        z = z[valid_mask]
+        if len(screen_pts) == len(z) and len(z) >= 3:
+            if self.compact_buffers:
+                color = self.pack_color(color)
+            pts = np.column_stack((screen_pts, z))
+            return {
+                "points": pts,
+                "color": color
+            }
+        return None
@@ -0,0 +1,35 @@
+class ResolutionScaler:
+    def __init__(self, budget, min_scale=0.25, max_scale=1.0, smoothing=0.3, headroom=0.7, step=0.05):
+        self.budget = budget
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.step = step
+        self.scale = max_scale
+        self.frame_time = None
+
+    def size(self, width, height):
+        return max(int(width * self.scale), 1), max(int(height * self.scale), 1)
+
+    def observe(self, frame_time):
+        # Wygładzony czas klatki, żeby pojedyncze skoki nie zmieniały rozdzielczości
+        if self.frame_time is None:
+            self.frame_time = frame_time
+        else:
+            self.frame_time += self.smoothing * (frame_time - self.frame_time)
+
+        if self.frame_time > self.budget:
+            # Czas rośnie z liczbą pikseli, czyli z kwadratem skali
+            target = self.scale * (self.budget / self.frame_time) ** 0.5
+            self.set_scale(min(target, self.scale - self.step))
+        elif self.frame_time < self.budget * self.headroom:
+            self.set_scale(self.scale + self.step)
+        return self.scale
+
+    def set_scale(self, scale):
+        scale = min(max(scale, self.min_scale), self.max_scale)
+        if scale != self.scale:
+            # Po zmianie rozdzielczości poprzednie pomiary przestają być miarodajne
+            self.frame_time *= (scale / self.scale) ** 2
+            self.scale = scale
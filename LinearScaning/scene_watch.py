@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+import numpy as np
+from prism import Prism
+from faces import SceneFaces, plane_slabs
+from spatial import prism_bounds
+from bsp import BSPTree
+
+CHUNK = 1 << 20
+WHITESPACE = b" \t\r\n"
+
+SPECIAL = np.zeros(256, dtype=bool)
+SPECIAL[list(b'"\\{}[]')] = True
+
+def element_spans(data, offset=0):
+    # Granice obiektów najwyższego poziomu w data, które musi zaczynać się poza napisem i poza obiektem
+    chars = np.frombuffer(data, dtype=np.uint8)
+    pos = np.flatnonzero(SPECIAL[chars])
+    ch = chars[pos]
+
+    # Cudzysłów jest zwykłym znakiem, gdy poprzedza go nieparzysta liczba ukośników
+    slash = ch == ord("\\")
+    joined = np.zeros(len(pos), dtype=bool)
+    joined[1:] = slash[1:] & slash[:-1] & (pos[1:] == pos[:-1] + 1)
+    run_start = np.maximum.accumulate(np.where(joined, 0, np.arange(len(pos))))
+    run = np.arange(len(pos)) - run_start + 1
+    quote = ch == ord('"')
+    escaped = np.zeros(len(pos), dtype=bool)
+    escaped[1:] = slash[:-1] & (pos[:-1] == pos[1:] - 1) & (run[:-1] % 2 == 1)
+    quote &= ~escaped
+
+    outside = np.cumsum(quote) % 2 == 0
+    opens = outside & ((ch == ord("{")) | (ch == ord("[")))
+    closes = outside & ((ch == ord("}")) | (ch == ord("]")))
+    depth = np.cumsum(opens.astype(np.int64) - closes)
+    starts = pos[opens & (depth == 1)]
+    ends = pos[closes & (depth == 0)] + 1
+    if len(starts) != len(ends) or (len(depth) and depth[-1] != 0) or np.any(starts[1:] < ends[:-1]):
+        raise ValueError("niezamknięty obiekt")
+    if np.any(ch[np.searchsorted(pos, starts)] != ord("{")):
+        raise ValueError("element sceny nie jest obiektem")
+    return starts + offset, ends + offset
+
+def common_prefix(a, b):
+    # Porównujemy porcjami, żeby nie tworzyć tablicy wielkości całego pliku
+    n = min(len(a), len(b))
+    for start in range(0, n, CHUNK):
+        stop = min(start + CHUNK, n)
+        differ = np.flatnonzero(a[start:stop] != b[start:stop])
+        if len(differ):
+            return start + int(differ[0])
+    return n
+
+def common_suffix(a, b, limit):
+    for start in range(0, limit, CHUNK):
+        stop = min(start + CHUNK, limit)
+        differ = np.flatnonzero(a[len(a) - stop:len(a) - start] != b[len(b) - stop:len(b) - start])
+        if len(differ):
+            return stop - int(differ[-1]) - 1
+    return limit
+
+class SceneWatcher:
+    # Obserwuje plik sceny i zwraca zmiany jako podmianę zakresu elementów (start, stop, nowe prostopadłościany)
+    def __init__(self, path):
+        self.path = path
+        self.stamp = self.file_stamp()
+        with open(path, 'rb') as f:
+            self.load(f.read())
+
+    def file_stamp(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, data):
+        # Poprawny JSON z tą samą liczbą elementów co znalezione granice gwarantuje poprawne przecinki
+        items = json.loads(data)
+        if not isinstance(items, list):
+            raise ValueError("scena nie jest listą")
+        self.open = data.index(b"[")
+        self.close = data.rindex(b"]")
+        starts, ends = element_spans(data[self.open + 1:self.close], self.open + 1)
+        if len(starts) != len(items):
+            raise ValueError("niezgodna liczba elementów")
+        self.data, self.starts, self.ends = data, starts, ends
+        return items
+
+    def state(self):
+        return self.data, self.open, self.close, self.starts, self.ends
+
+    def restore(self, state):
+        self.data, self.open, self.close, self.starts, self.ends = state
+
+    def check_gaps(self, data, starts, ends, lo, hi, before, after):
+        # Przecinek tylko między dwoma elementami, poza tym same białe znaki
+        bounds = np.concatenate(([lo], np.column_stack((starts, ends)).ravel(), [hi])).tolist()
+        for k in range(len(starts) + 1):
+            gap = data[bounds[2 * k]:bounds[2 * k + 1]].strip(WHITESPACE)
+            between = (k > 0 or before) and (k < len(starts) or after)
+            if gap != (b"," if between else b""):
+                raise ValueError(f"nieoczekiwany tekst między elementami: {gap[:20]!r}")
+
+    def parse(self, data, starts, ends):
+        return json.loads(b"[" + b",".join(data[a:b] for a, b in zip(starts.tolist(), ends.tolist())) + b"]")
+
+    def poll(self):
+        try:
+            stamp = self.file_stamp()
+        except OSError:
+            return None
+        if stamp == self.stamp:
+            return None
+        self.stamp = stamp
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        try:
+            return self.diff(data)
+        except ValueError as error:
+            print(f"Pominięto zmianę sceny {self.path}: {error}")
+            return None
+
+    def diff(self, data):
+        old = np.frombuffer(self.data, dtype=np.uint8)
+        new = np.frombuffer(data, dtype=np.uint8)
+        prefix = common_prefix(old, new)
+        suffix = common_suffix(old, new, min(len(old), len(new)) - prefix)
+        old_stop = len(old) - suffix
+        shift = len(new) - len(old)
+        if prefix == len(old) == len(new):
+            return None
+
+        if prefix <= self.open or old_stop > self.close:
+            # Zmiana dotyka nawiasów listy: wczytujemy całość
+            count = len(self.starts)
+            items = self.load(data)
+            return 0, count, [Prism.from_dict(item) for item in items]
+
+        # Elementy, których tekst zmiana przecina albo których dotyka
+        first = int(np.searchsorted(self.ends, prefix, side="left"))
+        last = int(np.searchsorted(self.starts, old_stop, side="right"))
+        lo = min(prefix, int(self.starts[first])) if first < last else prefix
+        hi = max(old_stop, int(self.ends[last - 1])) if first < last else old_stop
+        # Obszar do ponownej analizy rozszerzamy do sąsiadów, żeby sprawdzić przecinki między nimi
+        gap_lo = int(self.ends[first - 1]) if first > 0 else self.open + 1
+        gap_hi = int(self.starts[last]) + shift if last < len(self.starts) else self.close + shift
+        starts, ends = element_spans(data[lo:hi + shift], lo)
+        self.check_gaps(data, starts, ends, gap_lo, gap_hi, first > 0, last < len(self.starts))
+
+        # Elementy o niezmienionej treści na obu końcach nie wymagają podmiany
+        old_items = self.parse(self.data, self.starts[first:last], self.ends[first:last])
+        new_items = self.parse(data, starts, ends)
+        head = 0
+        while head < min(len(old_items), len(new_items)) and old_items[head] == new_items[head]:
+            head += 1
+        tail = 0
+        while tail < min(len(old_items), len(new_items)) - head and old_items[-1 - tail] == new_items[-1 - tail]:
+            tail += 1
+        prisms = [Prism.from_dict(item) for item in new_items[head:len(new_items) - tail]]
+
+        self.starts = np.concatenate((self.starts[:first], starts, self.starts[last:] + shift))
+        self.ends = np.concatenate((self.ends[:first], ends, self.ends[last:] + shift))
+        self.close += shift
+        self.data = data
+        return first + head, last - tail, prisms
+
+class SceneUpdate:
+    # Gotowa zmiana sceny; apply wykonuje tylko podmiany, więc można ją wywołać między klatkami
+    def __init__(self, start, stop, prisms, planes=None, plane_faces=None, bsp=None):
+        self.start = start
+        self.stop = stop
+        self.prisms = prisms
+        self.planes = planes
+        self.plane_faces = plane_faces
+        self.bsp = bsp
+
+    def apply(self, renderer):
+        renderer.prisms[self.start:self.stop] = self.prisms
+        if self.planes is not None:
+            renderer.faces.replace_planes(self.planes, self.plane_faces)
+        if self.bsp is not None:
+            renderer.bsp = self.bsp
+
+class SceneReloader:
+    # Wątek w tle: porównuje plik sceny, aktualizuje indeks przestrzenny i przygotowuje SceneUpdate dla renderera
+    def __init__(self, watcher, prisms, spatial_index, faces=None, bsp=False, interval=0.25):
+        self.watcher = watcher
+        self.prisms = prisms
+        self.spatial_index = spatial_index
+        # Własna kopia ścian, bo renderer czyta swoje w trakcie rysowania
+        self.faces = faces.copy() if isinstance(faces, SceneFaces) else None
+        self.bsp = bsp
+        self.interval = interval
+        # Chroni prisms i spatial_index, z których korzysta też wskazywanie myszą
+        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.updates = []
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    def poll(self):
+        with self.condition:
+            updates, self.updates = self.updates, []
+        return updates
+
+    def prepare(self, change):
+        start, stop, prisms = change
+        planes, plane_faces, bsp = None, None, None
+        # Wszystko liczymy przed zmianą wspólnej listy i indeksu, żeby błąd nie zostawił ich niespójnych
+        mins, maxs = prism_bounds(prisms)
+        if self.faces is not None:
+            # Przeliczamy płaszczyzny starych i nowych ścian razem ze wszystkim, co na nich leży
+            planes = np.union1d(self.faces.planes_of(self.prisms[start:stop]), self.faces.planes_of(prisms))
+            _, ids = self.spatial_index.query_boxes(*plane_slabs(planes))
+            ids = np.unique(ids)
+            kept = ids[(ids < start) | (ids >= stop)]
+            plane_faces = self.faces.plane_faces([self.prisms[k] for k in kept.tolist()] + prisms, planes)
+        if self.bsp:
+            # Drzewo BSP nie ma aktualizacji przyrostowej, budujemy je od nowa poza pętlą główną
+            if self.faces is not None:
+                faces = self.faces.copy()
+                faces.replace_planes(planes, plane_faces)
+            else:
+                scene = self.prisms[:start] + prisms + self.prisms[stop:]
+                faces = Prism.extract_faces([(prism.transformed_vertices(), prism.color) for prism in scene])
+            bsp = BSPTree.from_faces(list(faces))
+
+        with self.lock:
+            self.prisms[start:stop] = prisms
+            self.spatial_index.splice(start, stop, mins, maxs)
+        if self.faces is not None:
+            self.faces.replace_planes(planes, plane_faces)
+        return SceneUpdate(start, stop, prisms, planes, plane_faces, bsp)
+
+    def _run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: not self.running, self.interval)
+                if not self.running:
+                    return
+
+            state = self.watcher.state()
+            try:
+                change = self.watcher.poll()
+                update = self.prepare(change) if change is not None else None
+            except Exception as error:
+                # Obserwator wraca do stanu zgodnego ze sceną; zmiana zostanie ponowiona przy następnym zapisie pliku
+                self.watcher.restore(state)
+                print(f"Nie udało się przeładować sceny {self.watcher.path}: {error!r}")
+                continue
+            if update is not None:
+                with self.condition:
+                    self.updates.append(update)
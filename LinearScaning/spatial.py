@@ -0,0 +1,259 @@
+import numpy as np
+
+BRANCHING = 64
+MORTON_BITS = 10
+
+def prism_bounds(prisms):
+    vertices = np.array([prism.transformed_vertices()[:, :3] for prism in prisms], dtype=np.float64).reshape(-1, 8, 3)
+    return vertices.min(axis=1), vertices.max(axis=1)
+
+def spread_bits(x):
+    x = x.astype(np.uint64) & np.uint64(0x3ff)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x030000ff)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x0300f00f)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x030c30c3)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x09249249)
+    return x
+
+def morton_codes(centers, lo, hi):
+    cells = np.clip((centers - lo) / np.maximum(hi - lo, 1e-12), 0, 1) * ((1 << MORTON_BITS) - 1)
+    return spread_bits(cells[:, 0]) | (spread_bits(cells[:, 1]) << np.uint64(1)) | (spread_bits(cells[:, 2]) << np.uint64(2))
+
+# Granice i zapytania trzymamy jako tablice (3, n): redukcje po osi 0 i np.take(..., axis=1)
+# są w NumPy wielokrotnie szybsze niż operacje na krótkiej osi 1
+
+def ray_box(origins, inv_dirs, mins, maxs):
+    # Test płyt: przedział t wspólny dla trzech par płaszczyzn
+    with np.errstate(invalid="ignore"):
+        t1 = (mins - origins) * inv_dirs
+        t2 = (maxs - origins) * inv_dirs
+        near, far = np.fmin(t1, t2), np.fmax(t1, t2)
+    t_near = np.maximum(np.fmax(np.fmax(near[0], near[1]), near[2]), 0)
+    t_far = np.fmin(np.fmin(far[0], far[1]), far[2])
+    return t_near <= t_far, t_near
+
+def box_distance(points, mins, maxs):
+    d = np.maximum(np.maximum(mins - points, points - maxs), 0)
+    return np.sqrt((d * d).sum(axis=0))
+
+def first_per_group(group, key):
+    order = np.lexsort((key, group))
+    first = np.concatenate(([True], group[order[1:]] != group[order[:-1]])) if len(order) else order.astype(bool)
+    return order, first
+
+def as_columns(values):
+    return np.atleast_2d(np.asarray(values, dtype=np.float64)).T
+
+class SpatialIndex:
+    # Drzewo AABB o szerokich węzłach: prostopadłościany posortowane wzdłuż krzywej Mortona,
+    # każdy węzeł obejmuje BRANCHING kolejnych dzieci, więc drzewo to tylko tablice granic na poziomach.
+    # Usunięte liście mają granice NaN, których nie trafia żaden test, a fmin/fmax je pomijają.
+    def __init__(self, mins, maxs, branching=BRANCHING):
+        mins = np.asarray(mins, dtype=np.float64).reshape(-1, 3)
+        maxs = np.asarray(maxs, dtype=np.float64).reshape(-1, 3)
+        self.branching = branching
+        centers = (mins + maxs) / 2
+        self.lo = centers.min(axis=0) if len(mins) else np.zeros(3)
+        self.hi = centers.max(axis=0) if len(mins) else np.zeros(3)
+        codes = morton_codes(centers, self.lo, self.hi)
+        # order: pozycja liścia -> indeks prostopadłościanu, positions: odwrotnie
+        self.order = np.argsort(codes, kind="stable")
+        self.positions = np.empty_like(self.order)
+        self.positions[self.order] = np.arange(len(self.order))
+        self.codes = codes[self.order]
+        self.live = len(mins)
+        self.mins = [np.ascontiguousarray(mins[self.order].T)]
+        self.maxs = [np.ascontiguousarray(maxs[self.order].T)]
+        self.build_levels(1)
+
+    @staticmethod
+    def from_prisms(prisms):
+        return SpatialIndex(*prism_bounds(prisms))
+
+    def __len__(self):
+        return self.live
+
+    def level_size(self, level):
+        return self.mins[level].shape[1]
+
+    def build_levels(self, level):
+        del self.mins[level:], self.maxs[level:]
+        while self.level_size(-1) > self.branching:
+            starts = np.arange(0, self.level_size(-1), self.branching)
+            self.mins.append(np.fmin.reduceat(self.mins[-1], starts, axis=1))
+            self.maxs.append(np.fmax.reduceat(self.maxs[-1], starts, axis=1))
+
+    def refit(self, positions):
+        # Przelicza tylko przodków zmienionych liści
+        nodes = np.unique(positions)
+        for level in range(1, len(self.mins)):
+            nodes = np.unique(nodes // self.branching)
+            missing = nodes[-1] + 1 - self.level_size(level) if len(nodes) else 0
+            if missing > 0:
+                self.mins[level] = np.concatenate((self.mins[level], np.full((3, missing), np.nan)), axis=1)
+                self.maxs[level] = np.concatenate((self.maxs[level], np.full((3, missing), np.nan)), axis=1)
+            # Ostatni węzeł może mieć mniej dzieci, powtórzenie ostatniego nie zmienia min/max
+            child = np.minimum(nodes[:, None] * self.branching + np.arange(self.branching), self.level_size(level - 1) - 1)
+            self.mins[level][:, nodes] = np.fmin.reduce(self.mins[level - 1][:, child], axis=2)
+            self.maxs[level][:, nodes] = np.fmax.reduce(self.maxs[level - 1][:, child], axis=2)
+        if self.level_size(-1) > self.branching:
+            self.build_levels(len(self.mins))
+
+    def splice(self, start, stop, mins, maxs):
+        # Prostopadłościany [start, stop) zastąpione nowymi, jak przy przypisaniu do wycinka listy
+        mins = np.asarray(mins, dtype=np.float64).reshape(-1, 3)
+        maxs = np.asarray(maxs, dtype=np.float64).reshape(-1, 3)
+        common = min(len(mins), stop - start)
+
+        # Zmienione w miejscu, nadmiarowe usunięte zostają jako puste liście
+        changed = self.positions[start:start + common]
+        self.mins[0][:, changed] = mins[:common].T
+        self.maxs[0][:, changed] = maxs[:common].T
+        removed = self.positions[start + common:stop]
+        self.mins[0][:, removed] = np.nan
+        self.maxs[0][:, removed] = np.nan
+        self.order[removed] = -1
+        self.order[self.order >= stop] += len(mins) - (stop - start)
+
+        # Nowe liście dopisujemy na końcu, poza kolejnością Mortona
+        added = self.level_size(0) + np.arange(len(mins) - common)
+        self.mins[0] = np.concatenate((self.mins[0], mins[common:].T), axis=1)
+        self.maxs[0] = np.concatenate((self.maxs[0], maxs[common:].T), axis=1)
+        self.order = np.concatenate((self.order, start + common + np.arange(len(added))))
+        self.positions = np.concatenate((self.positions[:start + common], added, self.positions[stop:]))
+        self.live += len(mins) - (stop - start)
+
+        # Gdy pustych i nieposortowanych liści jest za dużo, budujemy drzewo od nowa
+        degraded = (self.level_size(0) - self.live) + (self.level_size(0) - len(self.codes))
+        if degraded > max(self.live // 4, self.branching):
+            self.rebuild()
+        else:
+            self.refit(np.concatenate((changed, removed, added)))
+
+    def rebuild(self):
+        live = np.flatnonzero(self.order >= 0)
+        mins = np.empty((self.live, 3))
+        maxs = np.empty((self.live, 3))
+        mins[self.order[live]] = self.mins[0][:, live].T
+        maxs[self.order[live]] = self.maxs[0][:, live].T
+        self.__init__(mins, maxs, self.branching)
+
+    def children(self, query, node, level):
+        # Dzieci węzła leżą w ciągłym zakresie poziomu niżej
+        child = (node[:, None] * self.branching + np.arange(self.branching)).ravel()
+        query = np.repeat(query, self.branching)
+        valid = child < self.level_size(level - 1)
+        return query[valid], child[valid]
+
+    def traverse(self, count, test, bottom=0):
+        # Zejście poziom po poziomie, wszystkie pary (zapytanie, węzeł) naraz
+        top = len(self.mins) - 1
+        query = np.repeat(np.arange(count), self.level_size(top))
+        node = np.tile(np.arange(self.level_size(top)), count)
+        for level in range(top, bottom - 1, -1):
+            if level < top:
+                query, node = self.children(query, node, level + 1)
+            keep = test(query, node, level)
+            query, node = query[keep], node[keep]
+        return query, node
+
+    def ray_cast(self, origins, directions, wave=4):
+        origins, directions = as_columns(origins), as_columns(directions)
+        with np.errstate(divide="ignore"):
+            inv_dirs = 1 / directions
+        hit_index = np.full(origins.shape[1], -1, dtype=np.int64)
+        hit_t = np.full(origins.shape[1], np.inf)
+        if len(self) == 0:
+            return hit_index, hit_t
+
+        def hits(query, node, level):
+            return ray_box(np.take(origins, query, axis=1), np.take(inv_dirs, query, axis=1),
+                           np.take(self.mins[level], node, axis=1), np.take(self.maxs[level], node, axis=1))
+
+        # Do poziomu bloków razem, potem bloki od najbliższego, w falach podwajających się od `wave` na promień
+        bottom = min(1, len(self.mins) - 1)
+        query, block = self.traverse(origins.shape[1], lambda q, n, level: hits(q, n, level)[0], bottom)
+        _, t_block = hits(query, block, bottom)
+        order = np.lexsort((t_block, query))
+        query, block, t_block = query[order], block[order], t_block[order]
+        starts = np.searchsorted(query, np.arange(origins.shape[1]))
+        rank = np.arange(len(query)) - starts[query]
+
+        active = np.ones(origins.shape[1], dtype=bool)
+        first = 0
+        while True:
+            batch = np.flatnonzero((rank >= first) & (rank < first + wave) & active[query])
+            if len(batch) == 0:
+                break
+            q, node = query[batch], block[batch]
+            if bottom == 1:
+                q, node = self.children(q, node, 1)
+            hit, t = hits(q, node, 0)
+            q, node, t = q[hit], node[hit], t[hit]
+            order, best = first_per_group(q, t)
+            q, node, t = q[order][best], node[order][best], t[order][best]
+            closer = t < hit_t[q]
+            hit_index[q[closer]] = self.order[node[closer]]
+            hit_t[q[closer]] = t[closer]
+
+            # Promień kończy się, gdy trafienie jest bliżej niż początek następnego bloku
+            first += wave
+            wave *= 2
+            following = rank == first
+            active[:] = False
+            active[query[following]] = t_block[following] < hit_t[query[following]]
+        return hit_index, hit_t
+
+    def query_boxes(self, lows, highs):
+        lows, highs = as_columns(lows), as_columns(highs)
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+        def test(query, node, level):
+            return (np.all(np.take(self.mins[level], node, axis=1) <= np.take(highs, query, axis=1), axis=0) &
+                    np.all(np.take(self.maxs[level], node, axis=1) >= np.take(lows, query, axis=1), axis=0))
+
+        query, node = self.traverse(lows.shape[1], test)
+        return query, self.order[node]
+
+    def nearest(self, points, n=1):
+        points = as_columns(points)
+        num_points = points.shape[1]
+        indices = np.full((num_points, n), -1, dtype=np.int64)
+        distances = np.full((num_points, n), np.inf)
+        if len(self) == 0:
+            return indices, distances
+
+        # Odległość do n-tego z sąsiadów na krzywej Mortona ogranicza z góry szukaną odpowiedź,
+        # więc odrzucamy każdy węzeł leżący dalej
+        bound = self.morton_bound(points, n)
+
+        def test(query, node, level):
+            near = box_distance(np.take(points, query, axis=1),
+                                np.take(self.mins[level], node, axis=1), np.take(self.maxs[level], node, axis=1))
+            return near <= bound[query]
+
+        query, node = self.traverse(num_points, test)
+        near = box_distance(np.take(points, query, axis=1),
+                            np.take(self.mins[0], node, axis=1), np.take(self.maxs[0], node, axis=1))
+        order = np.lexsort((near, query))
+        query, node, near = query[order], node[order], near[order]
+        starts = np.searchsorted(query, np.arange(num_points))
+        rank = np.arange(len(query)) - starts[query]
+        keep = rank < n
+        indices[query[keep], rank[keep]] = self.order[node[keep]]
+        distances[query[keep], rank[keep]] = near[keep]
+        return indices, distances
+
+    def morton_bound(self, points, n):
+        width = max(n, self.branching)
+        if len(self) < n:
+            return np.full(points.shape[1], np.inf)
+        size = min(2 * width, self.level_size(0))
+        position = np.searchsorted(self.codes, morton_codes(points.T, self.lo, self.hi))
+        start = np.clip(position - width, 0, self.level_size(0) - size)
+        window = start[:, None] + np.arange(size)
+        distance = box_distance(points[:, :, None], self.mins[0][:, window], self.maxs[0][:, window])
+        # Usunięte liście w oknie nie mogą zaniżyć granicy
+        distance[np.isnan(distance)] = np.inf
+        return np.partition(distance, n - 1, axis=1)[:, n - 1]
@@ -0,0 +1,31 @@
+import json
+
+import numpy as np
+from prism import Prism
+from faces import SceneFaces
+from bsp import BSPTree, load_or_build_bsp
+
+def prism_faces(prisms):
+    return Prism.extract_faces([(prism.transformed_vertices(), prism.color) for prism in prisms])
+
+def test_cache_follows_face_set(tmp_path, monkeypatch):
+    path = str(tmp_path / "scene.json")
+    with open(path, 'w') as f:
+        json.dump([{"size": [1, 1, 1], "position": [x, 0, -5], "color": [80, 0, 0]} for x in range(4)], f)
+    prisms = Prism.load_prisms_from_file(path)
+
+    built = []
+    from_faces = BSPTree.from_faces
+    monkeypatch.setattr(BSPTree, "from_faces", staticmethod(lambda faces: built.append(len(faces)) or from_faces(faces)))
+
+    # Przełączenie sposobu tworzenia ścian bez zmiany pliku sceny musi przebudować drzewo
+    plain = load_or_build_bsp(path, prism_faces(prisms))
+    merged = load_or_build_bsp(path, SceneFaces(prisms))
+    assert built == [len(prism_faces(prisms)), len(SceneFaces(prisms))]
+    assert len(merged.colors) < len(plain.colors)
+
+    cached = load_or_build_bsp(path, SceneFaces(prisms))
+    assert len(built) == 2
+    assert np.array_equal(cached.points, merged.points)
+    load_or_build_bsp(path, prism_faces(prisms))
+    assert len(built) == 3
@@ -0,0 +1,55 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pytest
+from camera import Camera
+from prism import Prism
+from mesh import Mesh, create_sphere
+from renderer import Renderer
+
+SIZE = (400, 300)
+# Głębokość uint16 myli kolejność tylko przy powierzchniach bliższych sobie niż krok kwantyzacji
+MAX_DIFFERENT = 0.005
+
+def grid_prisms():
+    return [Prism([0.9, 0.9, 0.9], [x - 4, y - 4, -10 - 2 * z], (40 * z % 256, 25 * x % 256, 30 * y % 256))
+            for z in range(4) for x in range(8) for y in range(8)]
+
+def far_prisms():
+    # Cała scena za płaszczyzną far kamery (100), na różnych głębokościach
+    return [Prism([6, 6, 6], [8 * x - 20, 8 * y - 16, -110 - 19 * z], (40 * z % 256, 50 * x % 256, 60 * y % 256))
+            for z in range(10) for x in range(6) for y in range(5)]
+
+def far_meshes():
+    return [Mesh(*create_sphere(30, 60, 40), position=(10, 0, -200), color=(200, 120, 60))]
+
+def sphere_meshes():
+    # Kule przecinają się nawzajem i siatkę prostopadłościanów, więc test głębokości rozstrzyga na krzywych przecięcia
+    return [Mesh(*create_sphere(6, 120, 80), position=(0, 0, -30), color=(200, 120, 60)),
+            Mesh(*create_sphere(2.5, 60, 40), position=(1, 0, -13), color=(60, 160, 220))]
+
+def unpack(img_buffer):
+    # Renderer bez ekranu pakuje piksele jako 0xRRGGBB
+    return np.stack(((img_buffer >> 16) & 255, (img_buffer >> 8) & 255, img_buffer & 255), axis=-1).astype(np.uint8)
+
+def render(prisms, meshes, compact):
+    camera = Camera()
+    camera.rotate(1, 0.2)
+    renderer = Renderer(None, camera, prisms, size=SIZE)
+    renderer.meshes = meshes
+    renderer.compact_buffers = compact
+    return renderer.render_frame()
+
+@pytest.mark.parametrize("prisms, meshes", [
+    (grid_prisms, list),
+    (list, sphere_meshes),
+    (grid_prisms, sphere_meshes),
+    (far_prisms, far_meshes),
+])
+def test_compact_buffers_match_float_buffers(prisms, meshes):
+    expected = render(prisms(), meshes(), compact=False)
+    compact = unpack(render(prisms(), meshes(), compact=True))
+
+    assert np.any(expected)
+    assert np.any(expected != compact, axis=-1).mean() <= MAX_DIFFERENT
@@ -0,0 +1,67 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pytest
+from camera import Camera
+from prism import Prism
+from faces import SceneFaces
+from renderer import Renderer
+
+SIZE = (400, 300)
+# Połączone ściany mają inne zaokrąglenia krawędzi niż ściany pojedynczych prostopadłościanów
+MAX_DIFFERENT = 0.01
+
+def floor_prisms():
+    return [Prism([1, 1, 1], [x, -3, z], (60 + 40 * (x % 3), 120, 60)) for x in range(-6, 7) for z in range(-19, -1)]
+
+def block_prisms():
+    # Lita bryła stykających się sześcianów: wnętrze jest zasłonięte, a warstwy tego samego koloru się łączą
+    return [Prism([1, 1, 1], [x - 3, y - 3, z - 22], (40 + 50 * (z % 4), 25 * x % 256, 90))
+            for z in range(6) for x in range(6) for y in range(6)]
+
+POSES = [
+    ((0, 0, 0), []),
+    # Nad podłogą, patrząc w dół i w górę, czyli z podłogą za płaszczyzną bliską
+    ((0, -0.5, -10), [(0, 0.3)]),
+    ((0, -0.5, -10), [(0, -0.3)]),
+    ((3, 1, -2), [(1, 0.4), (0, -0.2)]),
+    ((0, 2, -25), [(1, 3.0), (0, 0.2)]),
+]
+
+def camera_at(position, rotations):
+    camera = Camera()
+    camera.position = np.array(position, dtype=np.float64)
+    for axis, angle in rotations:
+        camera.rotate(axis, angle)
+    return camera
+
+@pytest.mark.parametrize("prisms, surface", [
+    # Podłoga 13x18: góra i dół każdego sześcianu plus obwód
+    (floor_prisms, 13 * 18 * 2 + 2 * (13 + 18)),
+    # Bryła 6x6x6: tylko ściany zewnętrzne
+    (block_prisms, 6 * 6 * 6),
+])
+def test_hidden_faces_removed_and_merged(prisms, surface):
+    prisms = prisms()
+    assert len(SceneFaces(prisms, merge=False)) == surface
+    assert len(SceneFaces(prisms)) < surface / 2
+
+@pytest.mark.parametrize("prisms", [floor_prisms, block_prisms])
+@pytest.mark.parametrize("position, rotations", POSES)
+def test_merged_faces_match_prism_faces(prisms, position, rotations):
+    prisms = prisms()
+    renderer = Renderer(None, camera_at(position, rotations), prisms, size=SIZE)
+    expected = renderer.render_frame()
+    renderer.faces = SceneFaces(prisms)
+    merged = renderer.render_frame()
+
+    different = np.any(expected != merged, axis=-1)
+    assert different.mean() <= MAX_DIFFERENT
+    assert abs(int(np.any(merged, axis=-1).sum()) - int(np.any(expected, axis=-1).sum())) <= MAX_DIFFERENT * different.size
+
+def test_looking_away_from_floor_draws_nothing():
+    prisms = floor_prisms()
+    renderer = Renderer(None, camera_at((0, -0.5, -10), [(0, -0.3)]), prisms, size=SIZE)
+    renderer.faces = SceneFaces(prisms)
+    assert not np.any(renderer.render_frame())
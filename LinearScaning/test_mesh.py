@@ -0,0 +1,36 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pytest
+from camera import Camera
+from prism import Prism, FACE_INDICES
+from mesh import Mesh
+from renderer import Renderer
+
+SIZE = (400, 300)
+MAX_DIFFERENT = 0.01
+
+def box_mesh(prism):
+    # Ten sam prostopadłościan jako siatka: każda ściana to dwa trójkąty o tej samej orientacji
+    triangles = [(a, b, c) for a, b, c, d in FACE_INDICES] + [(a, c, d) for a, b, c, d in FACE_INDICES]
+    return Mesh(prism.vertices[:, :3], triangles, prism.position, prism.color)
+
+def covered(prisms, meshes, camera):
+    renderer = Renderer(None, camera, prisms, size=SIZE)
+    renderer.meshes = meshes
+    return np.any(renderer.render_frame(), axis=-1)
+
+@pytest.mark.parametrize("rotations", [[(0, -0.05)], [(0, 0.1), (1, 0.5)], [(1, 3.0), (0, 0.1)], [(2, 0.3), (0, 0.1)]])
+def test_ground_mesh_is_clipped_like_prism_faces(rotations):
+    # Płyta podłogi sięga za kamerę, więc prawie każdy trójkąt przecina płaszczyznę bliską
+    ground = Prism([60, 60, 0.5], [0, -2, -10], (90, 160, 90))
+    camera = Camera()
+    for axis, angle in rotations:
+        camera.rotate(axis, angle)
+
+    expected = covered([ground], [], camera)
+    mesh = covered([], [box_mesh(ground)], camera)
+    # Podłoga zajmuje tylko część ekranu, więc porównanie sprawdza też położenie horyzontu
+    assert 0.1 < expected.mean() < 0.9
+    assert np.mean(expected != mesh) <= MAX_DIFFERENT
@@ -0,0 +1,71 @@
+import json
+import os
+import random
+
+import numpy as np
+from prism import Prism
+from faces import SceneFaces, build_scene_faces
+from spatial import SpatialIndex, prism_bounds
+from scene_watch import SceneWatcher, SceneReloader
+
+def solid_block(rng):
+    # Stykające się sześciany z wnętrzem, więc część płaszczyzn ma tylko zasłonięte ściany
+    return [{"size": [1, 1, 1], "position": [x, y, z - 10], "color": [rng.choice([80, 160]), 0, 0]}
+            for x in range(3) for y in range(3) for z in range(3)]
+
+def random_item(rng):
+    return {"size": [1, 1, rng.choice([1, 2])], "position": [rng.randint(-1, 3), rng.randint(-1, 3), rng.randint(-12, -7)],
+            "color": [rng.choice([80, 160]), 0, 0]}
+
+def write(path, items, rng):
+    with open(path, 'w') as f:
+        json.dump(items, f, indent=rng.choice([None, 2]))
+    # Dwa zapisy w tej samej chwili muszą mieć różne znaczniki
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + rng.randint(1, 10 ** 6)))
+
+def face_key(face):
+    return tuple(np.round(np.asarray(face["points"], dtype=np.float64).ravel(), 6)), tuple(face["color"])
+
+def test_incremental_reload_matches_full_rebuild(tmp_path):
+    rng = random.Random(0)
+    path = str(tmp_path / "scene.json")
+    items = solid_block(rng)
+    write(path, items, rng)
+    prisms = Prism.load_prisms_from_file(path)
+    index = SpatialIndex.from_prisms(prisms)
+    reloader = SceneReloader(SceneWatcher(path), prisms, index, SceneFaces(prisms))
+
+    # Najpierw zmiany sześcianu w środku bryły: wszystkie ściany na jego płaszczyznach są zasłonięte
+    center = [dict(items[13], color=[255, 0, 0]), dict(items[13], position=[1, 1, -9.5])]
+    for step in range(150):
+        if center:
+            items[13] = center.pop(0)
+        elif rng.random() < 0.4 and items:
+            items[rng.randrange(len(items))] = random_item(rng)
+        elif rng.random() < 0.5:
+            items.insert(rng.randint(0, len(items)), random_item(rng))
+        elif items:
+            del items[rng.randrange(len(items))]
+        write(path, items, rng)
+        change = reloader.watcher.poll()
+        if change is not None:
+            reloader.prepare(change)
+
+        expected = Prism.load_prisms_from_file(path)
+        assert [(p.position.tolist(), tuple(p.color)) for p in reloader.prisms] == \
+               [(p.position.tolist(), tuple(p.color)) for p in expected]
+        assert sorted(map(face_key, reloader.faces)) == sorted(map(face_key, build_scene_faces(expected)))
+        assert len(reloader.faces) == len(list(reloader.faces))
+
+        full = SpatialIndex.from_prisms(expected)
+        lows = np.array([[rng.uniform(-2, 4), rng.uniform(-2, 4), rng.uniform(-13, -6)] for _ in range(8)])
+        highs = lows + rng.uniform(0.5, 3)
+        got = sorted(zip(*(a.tolist() for a in index.query_boxes(lows, highs))))
+        want = sorted(zip(*(a.tolist() for a in full.query_boxes(lows, highs))))
+        assert got == want
+        if expected:
+            mins, maxs = prism_bounds(expected)
+            _, distance = index.nearest(lows, 1)
+            gap = np.maximum(0, np.maximum(mins[None] - lows[:, None], lows[:, None] - maxs[None]))
+            assert np.allclose(np.asarray(distance).ravel(), np.sqrt((gap ** 2).sum(axis=-1)).min(axis=1))
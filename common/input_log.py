@@ -0,0 +1,60 @@
+import struct
+
+EVENT_KEYDOWN = 1
+EVENT_KEYUP = 2
+EVENT_QUIT = 3
+
+MAGIC = b"GRIN"
+HEADER = struct.Struct("<4sd")
+# numer kroku symulacji, rodzaj zdarzenia, kod klawisza
+RECORD = struct.Struct("<IBI")
+
+class InputRecorder:
+    def __init__(self, path, step):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, step))
+
+    def record(self, step_index, kind, key=0):
+        self.file.write(RECORD.pack(step_index, kind, key))
+
+    def close(self):
+        self.file.close()
+
+class InputReplay:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, self.step = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"{path} nie jest zapisem wejścia")
+
+        self.events_by_step = {}
+        for step_index, kind, key in RECORD.iter_unpack(data[HEADER.size:]):
+            self.events_by_step.setdefault(step_index, []).append((kind, key))
+        self.last_step = max(self.events_by_step, default=0)
+        self.pressed = set()
+
+    def poll(self, step_index):
+        events = self.events_by_step.get(step_index, [])
+        for kind, key in events:
+            if kind == EVENT_KEYDOWN:
+                self.pressed.add(key)
+            elif kind == EVENT_KEYUP:
+                self.pressed.discard(key)
+        return events
+
+    def is_pressed(self, key):
+        return key in self.pressed
+
+def report_timings(timings, path=None):
+    if path:
+        with open(path, 'w') as f:
+            f.write("frame,step,render_ms\n")
+            for frame, (step, seconds) in enumerate(timings):
+                f.write(f"{frame},{step},{seconds * 1000:.3f}\n")
+
+    if timings:
+        ms = sorted(seconds * 1000 for _, seconds in timings)
+        print(f"{len(ms)} klatek: średnio {sum(ms) / len(ms):.2f} ms, "
+              f"mediana {ms[len(ms) // 2]:.2f} ms, p95 {ms[int(len(ms) * 0.95)]:.2f} ms, max {ms[-1]:.2f} ms")
@@ -0,0 +1,107 @@
+import threading
+import time
+
+class LoopScheduler:
+    def __init__(self, update, render, step=1 / 120, max_fps=60, max_steps=8, clock=time.perf_counter, sleep=time.sleep):
+        self.update = update
+        self.render = render
+        self.step = step
+        self.max_fps = max_fps
+        self.max_steps = max_steps
+        self.clock = clock
+        self.sleep = sleep
+        self.sim_time = 0.0
+        self.steps = 0
+        self.accumulator = 0.0
+        self.running = False
+        self.last_time = None
+
+    def stop(self):
+        self.running = False
+
+    def tick(self):
+        now = self.clock()
+        if self.last_time is None:
+            self.last_time = now
+        # Po długiej klatce nie nadrabiamy więcej niż max_steps kroków
+        frame_time = min(now - self.last_time, self.step * self.max_steps)
+        self.last_time = now
+        self.accumulator += frame_time
+
+        while self.accumulator >= self.step and self.running:
+            self.advance()
+            self.accumulator -= self.step
+
+        if self.running:
+            self.render(self.accumulator / self.step)
+
+        if self.max_fps:
+            remaining = 1 / self.max_fps - (self.clock() - now)
+            if remaining > 0:
+                self.sleep(remaining)
+
+    def advance(self):
+        self.update(self.sim_time, self.step)
+        self.steps += 1
+        # Czas liczony z numeru kroku, żeby odtworzenie dawało identyczne wartości
+        self.sim_time = self.steps * self.step
+
+    def run_virtual(self):
+        # Wirtualny zegar: jeden krok i jedna klatka na obieg, bez czekania
+        self.running = True
+        while self.running:
+            self.advance()
+            if self.running:
+                self.render(1.0)
+
+    def run(self):
+        self.running = True
+        self.last_time = None
+        while self.running:
+            self.tick()
+
+class RenderThread:
+    def __init__(self, render_frame):
+        self.render_frame = render_frame
+        self.condition = threading.Condition()
+        self.pending = None
+        self.result = None
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    def submit(self, snapshot):
+        # Liczy się tylko najnowszy stan kamery, starsze zlecenia są nadpisywane
+        with self.condition:
+            self.pending = snapshot
+            self.condition.notify()
+
+    def poll(self):
+        with self.condition:
+            result, self.result = self.result, None
+        return result
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and self.running:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                snapshot, self.pending = self.pending, None
+
+            frame = self.render_frame(snapshot)
+
+            with self.condition:
+                self.result = frame
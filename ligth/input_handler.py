@@ -1,14 +1,28 @@
 import glfw
+from input_log import EVENT_KEYDOWN, EVENT_KEYUP
 
 class InputHandler:
-    def __init__(self):
+    def __init__(self, recorder=None):
         self.keys = {}
+        self.recorder = recorder
+        self.step_index = 0
 
     def key_callback(self, window, key, scancode, action, mods):
         if action == glfw.PRESS:
             self.keys[key] = True
         elif action == glfw.RELEASE:
             self.keys[key] = False
+        else:
+            return
+        if self.recorder is not None:
+            self.recorder.record(self.step_index, EVENT_KEYDOWN if action == glfw.PRESS else EVENT_KEYUP, key)
+
+    def apply_events(self, events):
+        for kind, key in events:
+            if kind == EVENT_KEYDOWN:
+                self.keys[key] = True
+            elif kind == EVENT_KEYUP:
+                self.keys[key] = False
 
     def process_input(self, window, camera, delta, lightPos, light_speed):
         if self.keys.get(glfw.KEY_ESCAPE):
@@ -0,0 +1,29 @@
+import numpy as np
+from sphere import create_sphere
+
+# (sectors, stacks) od najdokładniejszego do najprostszego
+LOD_LEVELS = ((25, 25), (16, 16), (10, 10), (6, 6))
+# Minimalny promień na ekranie (w pikselach) dla poziomów 0..n-2
+LOD_THRESHOLDS = (80.0, 30.0, 10.0)
+LOD_HYSTERESIS = 0.15
+
+def create_sphere_lods(radius=1.0, levels=LOD_LEVELS):
+    return [create_sphere(radius=radius, sectors=s, stacks=t) for s, t in levels]
+
+def projected_radii(positions, radii, view, proj, viewport_height):
+    positions = np.atleast_2d(np.asarray(positions, dtype=np.float32))
+    homogeneous = np.hstack((positions, np.ones((len(positions), 1), dtype=np.float32)))
+    # pyrr trzyma macierze w konwencji wektorów wierszowych
+    view_pos = homogeneous @ np.asarray(view)
+    distance = np.maximum(np.linalg.norm(view_pos[:, :3], axis=1), 1e-6)
+    focal = np.asarray(proj)[1, 1]
+    return np.asarray(radii, dtype=np.float32) * focal / distance * viewport_height * 0.5
+
+def select_lod_levels(pixel_radii, current_levels, thresholds=LOD_THRESHOLDS, hysteresis=LOD_HYSTERESIS):
+    pixel_radii = np.asarray(pixel_radii)[:, None]
+    thresholds = np.asarray(thresholds)[None, :]
+    # Poziom można zmienić dopiero po przekroczeniu progu o zadany margines:
+    # większe numery to prostsze siatki, więc obecny poziom przycinamy do przedziału [finest, coarsest]
+    coarsest = np.sum(pixel_radii < thresholds * (1 + hysteresis), axis=1)
+    finest = np.sum(pixel_radii < thresholds * (1 - hysteresis), axis=1)
+    return np.clip(np.asarray(current_levels), finest, coarsest)
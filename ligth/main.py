@@ -1,23 +1,44 @@
+import os
 import sys
 import math
+import time
+import argparse
 import glfw
 import numpy as np
 from OpenGL.GL import *
 from pyrr import matrix44
 
+# Moduły wspólne dla wszystkich przeglądarek leżą w katalogu common obok katalogu tego skryptu
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common"))
 from camera import Camera
 from input_handler import InputHandler
-from sphere import create_sphere, Sphere
+from sphere import Sphere
+from lod import create_sphere_lods, projected_radii, select_lod_levels
 from material import Material
 from shader import ShaderProgram
+from input_log import InputRecorder, InputReplay, report_timings
+from scheduler import LoopScheduler
 
 WIDTH, HEIGHT = 800, 600
+UPDATE_STEP = 1 / 120
+MAX_UPDATE_STEPS = 8
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--record", help="zapisz zdarzenia klawiatury do pliku")
+parser.add_argument("--replay", help="odtwórz zapis w ukrytym oknie, z wirtualnym zegarem")
+parser.add_argument("--timings", help="plik CSV z czasami renderowania klatek podczas odtwarzania")
+args = parser.parse_args()
+recorder = InputRecorder(args.record, UPDATE_STEP) if args.record else None
+replay = InputReplay(args.replay) if args.replay else None
+
 if not glfw.init():
     print("Nie można zainicjalizować GLFW")
     sys.exit(1)
 glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
 glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 3)
 glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+if replay is not None:
+    glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
 
 window = glfw.create_window(WIDTH, HEIGHT, "Phong Lighting", None, None)
 if not window:
@@ -25,30 +46,34 @@ if not window:
     print("Nie można utworzyć okna GLFW")
     sys.exit(1)
 glfw.make_context_current(window)
+glfw.swap_interval(0 if replay is not None else 1)
 
 camera = Camera((0, 1, 30), (0, 1, 0), yaw=-90, pitch=0)
-input_handler = InputHandler()
-glfw.set_key_callback(window, input_handler.key_callback)
+input_handler = InputHandler(recorder)
+if replay is None:
+    glfw.set_key_callback(window, input_handler.key_callback)
 
 shader = ShaderProgram("shaders/vertex_shader.glsl", "shaders/fragment_shader.glsl")
 
-vertices, normals = create_sphere(radius=1.0, sectors=25, stacks=25)
-vao = glGenVertexArrays(1)
-vbo = glGenBuffers(2)
+sphere_lods = []
+for vertices, normals in create_sphere_lods(radius=1.0):
+    vao = glGenVertexArrays(1)
+    vbo = glGenBuffers(2)
 
-glBindVertexArray(vao)
+    glBindVertexArray(vao)
 
-glBindBuffer(GL_ARRAY_BUFFER, vbo[0])
-glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
-glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 0, None)
-glEnableVertexAttribArray(0)
+    glBindBuffer(GL_ARRAY_BUFFER, vbo[0])
+    glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STATIC_DRAW)
+    glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 0, None)
+    glEnableVertexAttribArray(0)
 
-glBindBuffer(GL_ARRAY_BUFFER, vbo[1])
-glBufferData(GL_ARRAY_BUFFER, normals.nbytes, normals, GL_STATIC_DRAW)
-glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 0, None)
-glEnableVertexAttribArray(1)
+    glBindBuffer(GL_ARRAY_BUFFER, vbo[1])
+    glBufferData(GL_ARRAY_BUFFER, normals.nbytes, normals, GL_STATIC_DRAW)
+    glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 0, None)
+    glEnableVertexAttribArray(1)
 
-glBindVertexArray(0)
+    glBindVertexArray(0)
+    sphere_lods.append((vao, vbo, len(vertices) // 3))
 
 # Light
 lightPos = np.array([5.0, 5.0, 5.0], dtype=np.float32)
@@ -100,14 +125,17 @@ create_spheres(y_poz, blue)
 create_spheres(-y_poz, green)
 
 glEnable(GL_DEPTH_TEST)
-last_time = glfw.get_time()
+timings = []
 
-while not glfw.window_should_close(window):
-    current_time = glfw.get_time()
-    delta = current_time - last_time
-    last_time = current_time
+def update(sim_time, step):
+    if replay is not None:
+        input_handler.apply_events(replay.poll(scheduler.steps))
+        if scheduler.steps >= replay.last_step:
+            glfw.set_window_should_close(window, True)
+    input_handler.process_input(window, camera, step, lightPos, light_speed)
 
-    input_handler.process_input(window, camera, delta, lightPos, light_speed)
+def render(alpha):
+    frame_start = time.perf_counter()
 
     glClearColor(0.1, 0.1, 0.1, 1.0)
     glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -125,8 +153,15 @@ while not glfw.window_should_close(window):
     shader.set_vec3("light.diffuse", lightDiffuse)
     shader.set_vec3("light.specular", lightSpecular)
 
-    glBindVertexArray(vao)
-    for sph in spheres:
+    sphere_positions = np.array([sph.position for sph in spheres])
+    pixel_radii = projected_radii(sphere_positions, [sph.radius for sph in spheres], view, proj, HEIGHT)
+    levels = select_lod_levels(pixel_radii, [sph.lod_level for sph in spheres])
+
+    for sph, level in zip(spheres, levels):
+        sph.lod_level = int(level)
+        vao, _, vertex_count = sphere_lods[sph.lod_level]
+        glBindVertexArray(vao)
+
         model = matrix44.create_from_translation(sph.position)
         shader.set_mat4("model", model)
 
@@ -136,13 +171,35 @@ while not glfw.window_should_close(window):
         shader.set_vec3("material.specular", mat.specular)
         shader.set_float("material.shininess", mat.shininess)
 
-        glDrawArrays(GL_TRIANGLES, 0, len(vertices) // 3)
+        glDrawArrays(GL_TRIANGLES, 0, vertex_count)
     glBindVertexArray(0)
 
+    if replay is not None:
+        glFinish()
+        timings.append((scheduler.steps, time.perf_counter() - frame_start))
+
     glfw.swap_buffers(window)
+    # Zdarzenia z poll_events trafią do zapisu jako należące do następnego kroku
+    input_handler.step_index = scheduler.steps
     glfw.poll_events()
-
-glDeleteVertexArrays(1, [vao])
-glDeleteBuffers(2, vbo)
+    if glfw.window_should_close(window):
+        scheduler.stop()
+
+# Przy vsync klatki taktuje swap_buffers, więc pętla nie czeka sama
+scheduler = LoopScheduler(update, render, step=UPDATE_STEP, max_fps=None, max_steps=MAX_UPDATE_STEPS)
+if replay is not None:
+    # Wirtualny zegar: dokładnie jeden krok na klatkę
+    scheduler.run_virtual()
+else:
+    scheduler.run()
+
+for vao, vbo, _ in sphere_lods:
+    glDeleteVertexArrays(1, [vao])
+    glDeleteBuffers(2, vbo)
 glDeleteProgram(shader.program)
 glfw.terminate()
+
+if recorder is not None:
+    recorder.close()
+if replay is not None:
+    report_timings(timings, args.timings)
@@ -2,9 +2,11 @@ import math
 import numpy as np
 
 class Sphere:
-    def __init__(self, position, material):
+    def __init__(self, position, material, radius=1.0):
         self.position = np.array(position, dtype=np.float32)
         self.material = material
+        self.radius = radius
+        self.lod_level = 0
 
 def create_sphere(radius=1.0, sectors=40, stacks=40):
     vertices = []
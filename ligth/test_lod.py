@@ -0,0 +1,26 @@
+import numpy as np
+from pyrr import matrix44
+from lod import LOD_THRESHOLDS, LOD_HYSTERESIS, projected_radii, select_lod_levels
+
+def test_projected_radii_match_perspective():
+    view = matrix44.create_look_at(np.array([0, 0, 5.0]), np.zeros(3), np.array([0, 1.0, 0]))
+    proj = matrix44.create_perspective_projection_matrix(90.0, 4 / 3, 0.1, 100.0)
+    radii = projected_radii([[0, 0, 0], [3, 0, -5]], [1.0, 2.0], view, proj, 600)
+    # Przy polu widzenia 90° ogniskowa wynosi 1, a odległości to 5 i sqrt(9 + 100)
+    assert np.allclose(radii, [1.0 / 5 * 300, 2.0 / np.sqrt(109) * 300], rtol=1e-5)
+
+def test_level_holds_inside_hysteresis_band():
+    threshold = LOD_THRESHOLDS[0]
+    inside = [threshold * (1 - LOD_HYSTERESIS / 2), threshold * (1 + LOD_HYSTERESIS / 2)]
+    # W paśmie wokół progu między poziomami 0 i 1 obie strony zostają przy swoim poziomie
+    assert select_lod_levels(inside, [0, 0]).tolist() == [0, 0]
+    assert select_lod_levels(inside, [1, 1]).tolist() == [1, 1]
+
+def test_level_switches_outside_hysteresis_band():
+    threshold = LOD_THRESHOLDS[0]
+    smaller = threshold * (1 - LOD_HYSTERESIS * 1.5)
+    larger = threshold * (1 + LOD_HYSTERESIS * 1.5)
+    assert select_lod_levels([smaller], [0]).tolist() == [1]
+    assert select_lod_levels([larger], [1]).tolist() == [0]
+    # Z dowolnego poziomu przechodzimy od razu na właściwy, także o kilka poziomów
+    assert select_lod_levels([1.0, 1000.0], [0, 3]).tolist() == [len(LOD_THRESHOLDS), 0]